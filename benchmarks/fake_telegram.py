@@ -0,0 +1,313 @@
+"""
+Local stand-in for the Telegram Bot API and the upstream APIs, for loadtest.py.
+
+One threaded HTTP server answers:
+
+    /bot<token>/<method>          getUpdates (long polling), sendMessage,
+                                  sendPhoto, sendDocument, getFile, setWebhook
+    /file/bot<token>/<path>       file downloads
+    /upstream/<host>/<path>       canned replies of OMDB, GitHub, OpenWeather,
+                                  cricapi, newsapi, ... after `upstream_latency`
+
+The bot is pointed at it with HTTP_HOST_OVERRIDES (see http_client.py). Every
+reply the bot sends is recorded with the time it arrived.
+"""
+
+import email.parser
+import email.policy
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Hosts the bot talks to besides Telegram, all served under /upstream/<host>
+UPSTREAM_HOSTS = (
+    "official-joke-api.appspot.com",
+    "dog-api.kinduff.com",
+    "api.github.com",
+    "api.thecatapi.com",
+    "api.cricapi.com",
+    "api.openweathermap.org",
+    "uselessfacts.jsph.pl",
+    "www.omdbapi.com",
+    "www.themealdb.com",
+    "raw.githubusercontent.com",
+    "newsapi.org",
+)
+
+ROSTER_TEXT = "\n".join(
+    f"Name: Student {n}, Roll: {n}, Branch: CSE, Section: A, Email: s{n}@example.com"
+    for n in range(1, 201)
+)
+
+
+def upstream_reply(host, path, query):
+    """
+    Returns (status, body) shaped like the real API's answer.
+    """
+    if host == "official-joke-api.appspot.com":
+        return 200, {"setup": "Why do programmers prefer dark mode?", "punchline": "Light attracts bugs."}
+    if host == "dog-api.kinduff.com":
+        return 200, {"facts": ["Dogs have about 1,700 taste buds."]}
+    if host == "api.github.com":
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        if path.startswith("/repos/"):
+            return 200, {
+                "name": name,
+                "html_url": f"https://github.com{path[6:]}",
+                "stargazers_count": 42,
+                "forks_count": 7,
+                "updated_at": "2024-01-01T00:00:00Z",
+            }
+        return 200, {
+            "login": name,
+            "html_url": f"https://github.com/{name}",
+            "public_repos": 12,
+            "followers": 34,
+        }
+    if host == "api.thecatapi.com":
+        return 200, [{"url": "https://cdn2.thecatapi.com/images/cat.jpg"}]
+    if host == "api.cricapi.com":
+        if path.endswith("/players"):
+            return 200, {"status": "success", "data": []}
+        return 200, {
+            "status": "success",
+            "data": [
+                {
+                    "id": "m1",
+                    "status": "Live",
+                    "matchStarted": True,
+                    "matchEnded": False,
+                    "teamInfo": [{"name": "Kolkata"}, {"name": "Mumbai"}],
+                    "score": [{"inning": "Kolkata Inning 1", "r": 120, "w": 3, "o": 14.2}],
+                }
+            ],
+        }
+    if host == "api.openweathermap.org":
+        return 200, {"main": {"temp": 31.5}, "weather": [{"description": "clear sky"}]}
+    if host == "uselessfacts.jsph.pl":
+        return 200, {"text": "Honey never spoils."}
+    if host == "www.omdbapi.com":
+        title = (query.get("t") or ["Movie"])[0]
+        return 200, {
+            "Response": "True",
+            "Title": title.title(),
+            "Year": "2010",
+            "Genre": "Sci-Fi",
+            "Actors": "Someone",
+            "imdbRating": "8.8",
+            "Plot": "A plot.",
+        }
+    if host == "www.themealdb.com":
+        meal = {f"strIngredient{i}": "" for i in range(1, 21)}
+        meal.update({f"strMeasure{i}": "" for i in range(1, 21)})
+        meal.update(
+            {
+                "strMeal": "Dal",
+                "strInstructions": "Cook.",
+                "strSource": "https://example.com",
+                "strMealThumb": "https://example.com/dal.jpg",
+                "strIngredient1": "Lentils",
+                "strMeasure1": "1 cup",
+            }
+        )
+        return 200, {"meals": [meal]}
+    if host == "raw.githubusercontent.com":
+        return 200, ROSTER_TEXT
+    if host == "newsapi.org":
+        return 200, {
+            "status": "ok",
+            "articles": [
+                {"title": f"Headline {n}", "source": {"name": "Example News"}}
+                for n in range(5)
+            ],
+        }
+    return 404, {"ok": False}
+
+
+def parse_params(handler, body):
+    """
+    Reads Bot API parameters from the query string, a form, JSON or multipart
+    body. Uploaded files are returned as bytes.
+    """
+    params = {k: v[0] for k, v in parse_qs(urlsplit(handler.path).query).items()}
+    content_type = handler.headers.get("Content-Type", "")
+    if content_type.startswith("application/json"):
+        params.update(json.loads(body or b"{}"))
+    elif content_type.startswith("application/x-www-form-urlencoded"):
+        params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+    elif content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.default).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            params[name] = payload if part.get_filename() else payload.decode()
+    return params
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # A bot stopped during a long poll just closes its connection
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeTelegram:
+    def __init__(self, upstream_latency=0.05, send_latency=0.0, port=0):
+        self.upstream_latency = upstream_latency
+        self.send_latency = send_latency
+        self.files = {}  # file_id -> bytes
+        self.replies = []  # (time, method, chat_id, reply_to_message_id)
+        self.calls = {}
+        self.first_calls = {}  # name -> time.monotonic() of its first call
+        self._updates = []
+        self._next_message_id = 1_000_000
+        self._cond = threading.Condition()
+        self._server = _Server(("127.0.0.1", port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def host_overrides(self):
+        """
+        The HTTP_HOST_OVERRIDES value that sends the bot here.
+        """
+        overrides = [f"api.telegram.org={self.url}"]
+        overrides += [f"{host}={self.url}/upstream/{host}" for host in UPSTREAM_HOSTS]
+        return ",".join(overrides)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-telegram", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_updates(self, updates):
+        with self._cond:
+            self._updates.extend(updates)
+            self._cond.notify_all()
+
+    def _count(self, name):
+        with self._cond:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.first_calls.setdefault(name, time.monotonic())
+            self._cond.notify_all()
+
+    def wait_for_call(self, name, timeout):
+        """
+        Returns the time of the first `name` call, or None after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while name not in self.first_calls:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.first_calls[name]
+
+    def record_reply(self, method, chat_id, reply_to):
+        with self._cond:
+            self.replies.append((time.monotonic(), method, chat_id, reply_to))
+            self._cond.notify_all()
+
+    def get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._cond:
+            while True:
+                # Like Telegram, asking with an offset confirms everything before it
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                if self._updates or time.monotonic() >= deadline:
+                    return self._updates[:limit]
+                self._cond.wait(deadline - time.monotonic())
+
+    def bot_method(self, method, params):
+        self._count(method)
+        if method == "getUpdates":
+            return self.get_updates(params)
+        if method == "getFile":
+            file_id = params.get("file_id")
+            return {"file_id": file_id, "file_path": f"documents/{file_id}"}
+        if method in ("sendMessage", "sendPhoto", "sendDocument"):
+            if self.send_latency:
+                time.sleep(self.send_latency)
+            reply_to = params.get("reply_to_message_id")
+            self.record_reply(method, params.get("chat_id"), int(reply_to) if reply_to else None)
+            with self._cond:
+                self._next_message_id += 1
+                result = {"message_id": self._next_message_id}
+            if method == "sendDocument":
+                document = params.get("document")
+                file_id = document if isinstance(document, str) else f"sent-{self._next_message_id}"
+                result["document"] = {"file_id": file_id}
+            return result
+        return True
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body, content_type="application/json"):
+                if not isinstance(body, bytes):
+                    if isinstance(body, str):
+                        body = body.encode()
+                    else:
+                        body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                path = urlsplit(self.path).path
+                parts = path.strip("/").split("/")
+
+                if parts[0] == "upstream" and len(parts) > 1:
+                    fake._count(parts[1])
+                    time.sleep(fake.upstream_latency)
+                    upstream_path = "/" + "/".join(parts[2:])
+                    query = parse_qs(urlsplit(self.path).query)
+                    status, reply = upstream_reply(parts[1], upstream_path, query)
+                    if isinstance(reply, str):
+                        return self._send(status, reply, "text/plain")
+                    return self._send(status, reply)
+
+                if parts[0] == "file" and len(parts) > 1:
+                    data = fake.files.get(parts[-1])
+                    if data is None:
+                        return self._send(404, {"ok": False})
+                    return self._send(200, data, "application/octet-stream")
+
+                if parts[0].startswith("bot") and len(parts) == 2:
+                    result = fake.bot_method(parts[1], parse_params(self, body))
+                    return self._send(200, {"ok": True, "result": result})
+                return self._send(404, {"ok": False, "description": "Not Found"})
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,441 @@
+"""
+Load test for long-polling.py and webhook.py against a local fake Bot API.
+
+    python benchmarks/loadtest.py --mode polling --updates 2000 --chats 200
+    python benchmarks/loadtest.py --mode webhook --upstream-latency 0.2 --json
+
+The bot runs as a separate process, unchanged, with HTTP_HOST_OVERRIDES pointing
+Telegram and every upstream API at fake_telegram.py. A synthetic stream of
+mixed commands, plain messages, images and PDFs from many chats is delivered
+through getUpdates (polling) or POSTed to /webhook, and every reply is matched
+to its message through reply_to_message_id. The report gives updates/s, reply
+latency percentiles measured from the moment each update was made available,
+and the peak RSS of the bot and its conversion processes. --json prints the
+same numbers as one JSON object, to compare runs and catch regressions.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_telegram import FakeTelegram  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (weight, text) of the generated messages, files are added with --files
+TEXT_MIX = (
+    (10, "/start"),
+    (5, "/help"),
+    (10, "/mood"),
+    (5, "/ipl"),
+    (8, "/joke"),
+    (8, "/dogfact"),
+    (8, "/fact"),
+    (6, "/cat"),
+    (8, "/weather Delhi, India"),
+    (6, "/weather Paris, France"),
+    (6, "/movie inception"),
+    (6, "/github torvalds"),
+    (4, "/github repo python/cpython"),
+    (6, "/news"),
+    (3, "/news sports india"),
+    (4, "/livescore"),
+    (4, "/devian 17"),
+    (10, "hello bot"),
+)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_png(size):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.new("RGB", (size, size))
+    pixels = image.load()
+    for x in range(0, size, 4):
+        for y in range(0, size, 4):
+            pixels[x, y] = (x % 256, y % 256, (x * y) % 256)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def make_pdf(pages):
+    """
+    A minimal valid PDF with one line of text per page.
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        stream = f"BT /F1 12 Tf 40 800 Td (Load test page {i + 1}) Tj ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF"
+    return out.encode()
+
+
+def generate_updates(count, chats, files_ratio, fake, seed=1):
+    """
+    Returns a list of updates and registers the uploaded files on `fake`.
+    Files get a unique file_unique_id each, so nothing is answered from cache.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in TEXT_MIX]
+    texts = [text for _, text in TEXT_MIX]
+    png = make_png(1024) if files_ratio else None
+    pdf = make_pdf(5) if files_ratio else None
+    if files_ratio:
+        fake.files["image"] = png
+        fake.files["pdf"] = pdf
+
+    updates = []
+    for n in range(count):
+        update_id = 1 + n
+        chat_id = 10_000 + rng.randrange(chats)
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "first_name": f"User{chat_id}"},
+        }
+        if files_ratio and rng.random() < files_ratio:
+            if png is not None and rng.random() < 0.5:
+                file_id, data, mime = "image", png, "image/png"
+            else:
+                file_id, data, mime = "pdf", pdf, "application/pdf"
+            message["document"] = {
+                "file_id": file_id,
+                "file_unique_id": f"{file_id}-{update_id}",
+                "file_name": f"upload.{'png' if mime == 'image/png' else 'pdf'}",
+                "mime_type": mime,
+                "file_size": len(data),
+            }
+        else:
+            message["text"] = rng.choices(texts, weights)[0]
+        updates.append({"update_id": update_id, "message": message})
+    return updates
+
+
+class RssSampler:
+    """
+    Samples VmHWM/VmRSS of a process and its children from /proc (Linux).
+    """
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.bot_peak_kb = 0
+        self.total_peak_kb = 0
+        self.available = os.path.exists(f"/proc/{pid}/status")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _status(pid, field):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _children(self):
+        children = []
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        if int(f.read().rsplit(")", 1)[1].split()[1]) == self.pid:
+                            children.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    pass
+        return children
+
+    def sample(self):
+        self.bot_peak_kb = max(self.bot_peak_kb, self._status(self.pid, "VmHWM"))
+        total = self._status(self.pid, "VmRSS")
+        total += sum(self._status(child, "VmRSS") for child in self._children())
+        self.total_peak_kb = max(self.total_peak_kb, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        if self.available:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.available:
+            self.sample()
+
+
+def bot_env(fake, workdir, args):
+    env = dict(os.environ)
+    env.update(
+        {
+            "BOT_TOKEN": "loadtest",
+            "NEWS_API_KEY": "loadtest",
+            "CRIC_KEY": "loadtest",
+            "OMDB_KEY": "loadtest",
+            "OPEN_WEATHER_KEY": "loadtest",
+            "HTTP_HOST_OVERRIDES": fake.host_overrides(),
+            "OFFSET_FILE": os.path.join(workdir, "offset"),
+            "HISTORY_DB": os.path.join(workdir, "history.sqlite3"),
+            "POLL_TIMEOUT": "5",
+            # The fake server is not Telegram, no need to pace the replies
+            "GLOBAL_SEND_RATE": str(args.send_rate),
+            "PRIVATE_CHAT_RATE": str(args.send_rate),
+            "GROUP_CHAT_RATE": str(args.send_rate),
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    if args.concurrency:
+        env["MAX_CONCURRENCY"] = str(args.concurrency)
+    if args.workers:
+        env["WORKER_PROCESSES"] = str(args.workers)
+    return env
+
+
+def post_updates(url, updates, scheduled, clients, on_inline_reply):
+    """
+    POSTs updates to the bot's webhook from `clients` threads, each update at
+    its scheduled time. Replies returned in the response are passed on.
+    """
+    lock = threading.Lock()
+    position = [0]
+
+    def worker():
+        while True:
+            with lock:
+                index = position[0]
+                position[0] += 1
+            if index >= len(updates):
+                return
+            delay = scheduled[index] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            update = updates[index]
+            request = urllib.request.Request(
+                url,
+                data=json.dumps(update).encode(),
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": "loadtest",
+                },
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    body = response.read()
+            except Exception as e:
+                print(f"Webhook request failed: {e}", file=sys.stderr)
+                continue
+            if body.startswith(b"{"):
+                call = json.loads(body)
+                on_inline_reply(call.get("method"), call.get("chat_id"), call.get("reply_to_message_id"))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for_http(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except Exception:
+            time.sleep(0.1)
+    return False
+
+
+def run(args):
+    fake = FakeTelegram(upstream_latency=args.upstream_latency, send_latency=args.send_latency)
+    fake.start()
+    updates = generate_updates(args.updates, args.chats, args.files, fake, args.seed)
+    workdir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    env = bot_env(fake, workdir, args)
+
+    if args.mode == "webhook":
+        port = free_port()
+        env.update(
+            {
+                "WEBHOOK_PORT": str(port),
+                "WEBHOOK_SECRET": "loadtest",
+                "WEBHOOK_BASE_URL": f"http://127.0.0.1:{port}",
+            }
+        )
+        script = "webhook.py"
+    else:
+        script = "long-polling.py"
+
+    process = subprocess.Popen(
+        [sys.executable, script],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL if args.quiet else None,
+        stderr=subprocess.DEVNULL if args.quiet else None,
+    )
+    sampler = RssSampler(process.pid).start()
+    try:
+        if args.mode == "webhook" and not wait_for_http(f"http://127.0.0.1:{port}/", 30):
+            raise RuntimeError("the webhook server did not start")
+        time.sleep(args.warmup)
+
+        # Update n is made available at start + n / rate (all at once without a rate)
+        start = time.monotonic()
+        interval = 1 / args.rate if args.rate else 0
+        scheduled = [start + n * interval for n in range(len(updates))]
+        made_available = {u["update_id"]: t for u, t in zip(updates, scheduled)}
+
+        if args.mode == "webhook":
+            post_updates(
+                f"http://127.0.0.1:{port}/webhook",
+                updates,
+                scheduled,
+                args.clients,
+                fake.record_reply,
+            )
+        elif interval:
+
+            def feed():
+                for update, at in zip(updates, scheduled):
+                    delay = at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    fake.add_updates([update])
+
+            threading.Thread(target=feed, daemon=True).start()
+        else:
+            fake.add_updates(updates)
+
+        # Done when every update got its first reply, or on timeout
+        first_reply = {}
+        deadline = start + args.timeout
+        seen = 0
+        while len(first_reply) < len(updates) and time.monotonic() < deadline:
+            time.sleep(0.05)
+            replies = fake.replies[seen:]
+            seen += len(replies)
+            for at, _, _, reply_to in replies:
+                if reply_to in made_available and reply_to not in first_reply:
+                    first_reply[reply_to] = at
+    finally:
+        sampler.stop()
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        fake.stop()
+
+    latencies = [at - made_available[update_id] for update_id, at in first_reply.items()]
+    finished = max(first_reply.values()) if first_reply else start
+    elapsed = max(finished - start, 1e-9)
+    report = {
+        "mode": args.mode,
+        "updates": len(updates),
+        "answered": len(first_reply),
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(len(first_reply) / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "latency_max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+        "bot_peak_rss_mb": round(sampler.bot_peak_kb / 1024, 1) if sampler.available else None,
+        "total_peak_rss_mb": round(sampler.total_peak_kb / 1024, 1) if sampler.available else None,
+        "telegram_calls": dict(sorted(fake.calls.items())),
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\nMode:            {report['mode']}")
+    print(f"Updates:         {report['answered']}/{report['updates']} answered in {report['seconds']}s")
+    print(f"Throughput:      {report['updates_per_second']} updates/s")
+    print(
+        f"Reply latency:   p50 {report['latency_p50_ms']} ms, "
+        f"p99 {report['latency_p99_ms']} ms, max {report['latency_max_ms']} ms"
+    )
+    print(
+        f"Peak RSS:        bot {report['bot_peak_rss_mb']} MB, "
+        f"with conversion processes {report['total_peak_rss_mb']} MB"
+    )
+    print("Calls received:  " + ", ".join(f"{k} {v}" for k, v in report["telegram_calls"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--updates", type=int, default=1000, help="updates to send")
+    parser.add_argument("--chats", type=int, default=100, help="distinct chats")
+    parser.add_argument("--files", type=float, default=0.02, help="share of image/PDF uploads")
+    parser.add_argument("--rate", type=float, default=0, help="updates per second, 0 sends all at once")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds per upstream API call")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds per sendMessage/sendPhoto/sendDocument")
+    parser.add_argument("--send-rate", type=float, default=10_000, help="GLOBAL/PER_CHAT send rates for the bot")
+    parser.add_argument("--concurrency", type=int, default=0, help="MAX_CONCURRENCY for the bot")
+    parser.add_argument("--workers", type=int, default=0, help="WORKER_PROCESSES for the bot (polling mode)")
+    parser.add_argument("--clients", type=int, default=8, help="parallel webhook requests")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds to let the bot start")
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up after this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quiet", action="store_true", help="hide the bot's output")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+    if report["answered"] < report["updates"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Cold start benchmark for long-polling.py.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --prewarm files,weather --json
+
+Every run starts fresh Python processes and reports the median and best of:
+
+    import          importing long-polling.py (and everything it imports),
+                    without running main()
+    first poll      from starting `python long-polling.py` until its first
+                    getUpdates reaches the fake Bot API of fake_telegram.py
+    plugin imports  what importing each plugin costs on first use, i.e. what
+                    PLUGINS_PREWARM moves to the start
+
+Run it before and after a change that adds imports to catch slower restarts.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_telegram import FakeTelegram  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import json, runpy, time
+started = time.perf_counter()
+runpy.run_path("long-polling.py", run_name="startup_benchmark")
+print(json.dumps({"import": time.perf_counter() - started}))
+"""
+
+PLUGIN_SNIPPET = """
+import json, time
+import handlers
+import plugins
+from commands import ROUTER
+timings = {}
+for name in plugins.PLUGINS:
+    started = time.perf_counter()
+    ROUTER.load_plugin("plugins." + name)
+    timings[name] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def bot_env(fake, workdir, args):
+    env = dict(os.environ)
+    env.update(
+        {
+            "BOT_TOKEN": "startup",
+            "HTTP_HOST_OVERRIDES": fake.host_overrides(),
+            "OFFSET_FILE": os.path.join(workdir, "offset"),
+            "HISTORY_DB": os.path.join(workdir, "history.sqlite3"),
+            "PLUGINS_PREWARM": args.prewarm,
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    if args.workers:
+        env["WORKER_PROCESSES"] = str(args.workers)
+    return env
+
+
+def run_snippet(snippet, env):
+    """
+    Runs Python code in a fresh interpreter and returns the JSON it printed last.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_to_first_poll(env, timeout, quiet):
+    fake = FakeTelegram()
+    fake.start()
+    env = dict(env, HTTP_HOST_OVERRIDES=fake.host_overrides())
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "long-polling.py"],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL if quiet else None,
+        stderr=subprocess.DEVNULL if quiet else None,
+    )
+    try:
+        polled_at = fake.wait_for_call("getUpdates", timeout)
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        fake.stop()
+    if polled_at is None:
+        raise RuntimeError(f"no getUpdates within {timeout} seconds")
+    return polled_at - started
+
+
+def summary(values):
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "best_ms": round(min(values) * 1000, 1),
+    }
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bot-startup-")
+    # Plugins start background refreshes, keep them away from the real APIs
+    fake = FakeTelegram().start()
+    try:
+        env = bot_env(fake, workdir, args)
+        imports = [run_snippet(IMPORT_SNIPPET, env)["import"] for _ in range(args.runs)]
+        plugins = [run_snippet(PLUGIN_SNIPPET, env) for _ in range(args.runs)]
+    finally:
+        fake.stop()
+    polls = [time_to_first_poll(env, args.timeout, args.quiet) for _ in range(args.runs)]
+    return {
+        "runs": args.runs,
+        "prewarm": args.prewarm,
+        "workers": args.workers,
+        "import": summary(imports),
+        "first_poll": summary(polls),
+        "plugin_imports_ms": {
+            name: round(statistics.median(run[name] for run in plugins) * 1000, 1)
+            for name in plugins[0]
+        },
+    }
+
+
+def print_report(report):
+    print(f"\nRuns:            {report['runs']} (prewarm: {report['prewarm'] or '-'})")
+    print(
+        f"Import:          median {report['import']['median_ms']} ms, "
+        f"best {report['import']['best_ms']} ms"
+    )
+    print(
+        f"First getUpdates: median {report['first_poll']['median_ms']} ms, "
+        f"best {report['first_poll']['best_ms']} ms"
+    )
+    print(
+        "Plugin imports:  "
+        + ", ".join(f"{name} {ms} ms" for name, ms in report["plugin_imports_ms"].items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh starts per measurement")
+    parser.add_argument("--prewarm", default="", help="PLUGINS_PREWARM for the bot, e.g. files,weather or all")
+    parser.add_argument("--workers", type=int, default=0, help="WORKER_PROCESSES for the bot")
+    parser.add_argument("--timeout", type=float, default=60.0, help="give up on a start after this many seconds")
+    parser.add_argument("--quiet", action="store_true", help="hide the bot's output")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
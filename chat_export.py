@@ -0,0 +1,174 @@
+"""
+Streaming /export.
+
+Rows are read from the history store in batches and written one by one into a
+spooled upload body (memory first, an anonymous temporary file when it grows),
+as JSON Lines or CSV and optionally gzip compressed. Nothing is built in memory
+as a whole and no named files are created, so two exports never collide. When
+a part reaches EXPORT_PART_BYTES (the Bot API accepts uploads up to 50 MB) it is
+finished and the next rows go to a new part.
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import zlib
+
+EXPORT_PART_BYTES = int(float(os.getenv("EXPORT_PART_MB", "49")) * 1024 * 1024)
+SPOOL_MAX_BYTES = 1024 * 1024
+
+FORMATS = ("json", "csv")
+CSV_HEADER = ("Timestamp", "User", "Message")
+
+
+class ExportPart:
+    """
+    One finished document: a rewound file object, its name and row count.
+    """
+
+    def __init__(self, body, filename, rows):
+        self.body = body
+        self.filename = filename
+        self.rows = rows
+
+    def close(self):
+        self.body.close()
+
+
+class _PartWriter:
+    def __init__(self, compress):
+        self.body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self.compress = compress
+        self.stream = gzip.GzipFile(fileobj=self.body, mode="wb") if compress else self.body
+        self.rows = 0
+        # Bytes handed to gzip since its output was last flushed, an upper
+        # bound for what may still be buffered inside the compressor
+        self.unflushed = 0
+
+    def fits(self, size, limit):
+        if self.body.tell() + self.unflushed + size <= limit:
+            return True
+        if self.compress and self.unflushed:
+            self.stream.flush(zlib.Z_SYNC_FLUSH)
+            self.unflushed = 0
+            return self.body.tell() + size <= limit
+        return False
+
+    def write(self, data):
+        self.stream.write(data)
+        if self.compress:
+            self.unflushed += len(data)
+
+    def finish(self):
+        if self.compress:
+            self.stream.close()  # Writes the gzip trailer, leaves body open
+        self.body.seek(0)
+        return self.body
+
+
+def _json_line(row):
+    ts, user, text = row
+    record = {"timestamp": ts, "user": user, "message": text}
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _csv_encoder():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(row):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    return encode
+
+
+def export_parts(rows, file_format, basename, compress=False, part_bytes=EXPORT_PART_BYTES):
+    """
+    Writes `rows` ((ts, user, text) tuples) and yields an ExportPart every
+    time a document is full, plus one for the rest. The caller closes them.
+    """
+    if file_format == "csv":
+        encode = _csv_encoder()
+        header = encode(CSV_HEADER)
+        extension = "csv"
+    else:
+        encode = _json_line
+        header = b""
+        extension = "jsonl"
+    if compress:
+        extension += ".gz"
+
+    part_number = 1
+    part = None
+
+    def new_part():
+        writer = _PartWriter(compress)
+        writer.write(header)
+        return writer
+
+    def finished(writer, number, last):
+        name = basename if number == 1 and last else f"{basename}_part{number}"
+        return ExportPart(writer.finish(), f"{name}.{extension}", writer.rows)
+
+    for row in rows:
+        data = encode(row)
+        if part is None:
+            part = new_part()
+        elif part.rows and not part.fits(len(data), part_bytes):
+            yield finished(part, part_number, last=False)
+            part_number += 1
+            part = new_part()
+        part.write(data)
+        part.rows += 1
+
+    if part is not None:
+        yield finished(part, part_number, last=True)
+
+
+def _parse_day(word):
+    try:
+        day = datetime.datetime.strptime(word, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Unknown export option {word}") from None
+    return day.replace(tzinfo=datetime.timezone.utc)
+
+
+def parse_export_args(args):
+    """
+    Parses "/export [json|csv] [gz] [[from] YYYY-MM-DD] [[to] YYYY-MM-DD]".
+    "from" and "to" bind the date after them; bare dates fill the start, then
+    the end. Returns (file_format, compress, since, until) with since/until as
+    unix times (until is the end of the given day, both in UTC), or raises
+    ValueError for a date or option that can't be read.
+    """
+    file_format = "json"
+    compress = False
+    dates = {}
+    words = iter(args)
+    for word in words:
+        if word in FORMATS:
+            file_format = word
+        elif word in ("gz", "gzip"):
+            compress = True
+        elif word in ("from", "to"):
+            bound = "since" if word == "from" else "until"
+            day = next(words, None)
+            if day is None or bound in dates:
+                raise ValueError(f"Expected one date after {word}")
+            dates[bound] = _parse_day(day)
+        else:
+            bound = "since" if "since" not in dates else "until"
+            if bound in dates:
+                raise ValueError("Too many dates")
+            dates[bound] = _parse_day(word)
+
+    since = dates["since"].timestamp() if "since" in dates else None
+    until = (dates["until"] + datetime.timedelta(days=1)).timestamp() if "until" in dates else None
+    return file_format, compress, since, until
@@ -0,0 +1,164 @@
+"""
+Message history kept for /export.
+
+Every message is written to a SQLite file with an index on (chat_id, timestamp),
+so history survives restarts and an export reads only the rows of one chat and
+time range. Rows hold just the chat id, the unix time, the sender's name and the
+text. Writes go through a queue to a single writer thread that commits them in
+batches, so recording a message never waits for the disk.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+
+HISTORY_DB = os.getenv("HISTORY_DB", "chat_history.sqlite3")
+# Messages older than this are deleted, 0 keeps them forever
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "0"))
+
+BATCH_SIZE = 500
+PRUNE_EVERY_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat_ts ON messages (chat_id, ts);
+"""
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                conn = self._connect()
+                conn.executescript(SCHEMA)
+                conn.close()
+                self._thread = threading.Thread(
+                    target=self._writer, name="history-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _writer(self):
+        conn = self._connect()
+        last_prune = 0.0
+        closing = False
+        while not closing:
+            rows = [self._queue.get()]
+            while len(rows) < BATCH_SIZE:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None closes the store, an Event asks for everything before it to be written
+            events = [row for row in rows if isinstance(row, threading.Event)]
+            closing = None in rows
+            rows = [row for row in rows if isinstance(row, tuple)]
+            try:
+                if rows:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO messages (chat_id, ts, user, text) VALUES (?, ?, ?, ?)",
+                            rows,
+                        )
+                if self.retention_days and time.time() - last_prune > PRUNE_EVERY_SECONDS:
+                    last_prune = time.time()
+                    with conn:
+                        conn.execute(
+                            "DELETE FROM messages WHERE ts < ?",
+                            (int(time.time() - self.retention_days * 86400),),
+                        )
+            except sqlite3.Error as e:
+                print(f"Error writing chat history: {e}")
+            for event in events:
+                event.set()
+        conn.close()
+
+    def record(self, chat_id, timestamp, user, text):
+        if chat_id is None:
+            return
+        self._start()
+        self._queue.put((chat_id, int(timestamp or time.time()), user, text))
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=10):
+        """
+        Waits until every recorded message has been written.
+        """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _range(self, chat_id, since, until):
+        """
+        Builds the WHERE clause of a range query, after flushing pending writes.
+        """
+        self._start()
+        self.flush()
+        where = "chat_id = ?"
+        params = [chat_id]
+        if since is not None:
+            where += " AND ts >= ?"
+            params.append(int(since))
+        if until is not None:
+            where += " AND ts < ?"
+            params.append(int(until))
+        return where, params
+
+    def messages(self, chat_id, since=None, until=None, batch_size=1000):
+        """
+        Yields (ts, user, text) for a chat in time order, optionally only
+        for since <= ts < until (unix times). Rows are read in batches.
+        """
+        where, params = self._range(chat_id, since, until)
+        query = f"SELECT ts, user, text FROM messages WHERE {where} ORDER BY ts, rowid"
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(10)
+            self._thread = None
+
+
+HISTORY = HistoryStore()
+
+METRICS.gauge_callback(
+    "bot_history_write_queue_depth",
+    "Messages waiting to be written to the history file",
+    lambda: HISTORY.pending,
+)
@@ -0,0 +1,309 @@
+"""
+Command registry shared by long-polling.py and webhook.py.
+
+Commands are registered by name with the @ROUTER.command decorator and found with
+a single dict lookup, so adding commands does not make dispatch slower. The
+message text is parsed once into a CommandContext that is passed to the handler.
+
+Commands registered with inline=True only answer with text. webhook.py runs them
+inside the request and, when they produce exactly one message, returns it as the
+webhook response instead of making a separate sendMessage call. That is only done
+while the chat has no replies waiting in SEND_QUEUE and its rate limits allow one
+more message, otherwise the reply is queued like any other.
+
+Commands with heavy dependencies live in the plugins package and are declared
+with ROUTER.plugin(): their module is only imported when one of its commands
+is used for the first time, see plugins/__init__.py.
+"""
+
+import importlib
+import time
+import threading
+from concurrent.futures import Future
+
+import telegram_api
+from metrics import METRICS
+from send_queue import SEND_QUEUE
+
+UPDATES = METRICS.counter(
+    "bot_updates_total", "Messages dispatched, per command", ("command",)
+)
+HANDLER_ERRORS = METRICS.counter(
+    "bot_handler_errors_total", "Handlers that raised, per command", ("command",)
+)
+HANDLER_SECONDS = METRICS.histogram(
+    "bot_handler_seconds", "Time spent in the handler, per command", ("command",)
+)
+
+
+class CommandContext:
+    """
+    Everything a handler needs to know about the incoming message.
+
+    command - the command token, lowercased and without @botname ("/weather")
+    args    - the rest of the (lowercased) text ("delhi, india")
+    text    - the whole lowercased text, raw_text keeps the original case
+    """
+
+    __slots__ = (
+        "update",
+        "message",
+        "chat_id",
+        "message_id",
+        "raw_text",
+        "text",
+        "command",
+        "args",
+        "document",
+        "outbox",
+    )
+
+    def __init__(self, update, message, outbox=None):
+        self.update = update
+        self.message = message
+        self.chat_id = message.get("chat", {}).get("id", None)
+        self.message_id = message.get("message_id")
+        self.raw_text = message.get("text", "").strip()
+        self.text = self.raw_text.lower()
+        self.document = message.get("document")
+        self.outbox = outbox
+
+        self.command = None
+        self.args = ""
+        if self.text.startswith("/"):
+            parts = self.text.split(maxsplit=1)
+            self.command = parts[0].split("@", 1)[0]
+            self.args = parts[1].strip() if len(parts) > 1 else ""
+
+    @property
+    def arg_list(self):
+        return self.args.split()
+
+    def reply(self, text, **kwargs):
+        if self.outbox is not None:
+            data = telegram_api.message_data(
+                self.chat_id, text, self.message_id, **kwargs
+            )
+            return self.outbox.add(
+                lambda: telegram_api.send_message(
+                    self.chat_id, text, self.message_id, **kwargs
+                ),
+                dict(data, method="sendMessage"),
+            )
+        return telegram_api.send_message(self.chat_id, text, self.message_id, **kwargs)
+
+    def reply_photo(self, photo, caption=None):
+        send = lambda: telegram_api.send_photo(
+            self.chat_id, photo, self.message_id, caption=caption
+        )
+        return self.outbox.add(send) if self.outbox is not None else send()
+
+    def reply_document(self, document, filename, caption=None):
+        send = lambda: telegram_api.send_document(
+            self.chat_id, document, filename, self.message_id, caption=caption
+        )
+        return self.outbox.add(send) if self.outbox is not None else send()
+
+
+def _copy_result(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class Outbox:
+    """
+    Collects the replies of a handler instead of sending them right away.
+
+    add() takes a function that sends the reply and, for plain text replies,
+    the Bot API call that could be returned in a webhook response. finish()
+    returns that call when it is the only reply and SEND_QUEUE gives it a
+    token, otherwise every reply is sent the normal way, in order.
+    """
+
+    def __init__(self):
+        self.actions = []  # (send, webhook_call or None, future)
+
+    def add(self, send, webhook_call=None):
+        future = Future()
+        self.actions.append((send, webhook_call, future))
+        return future
+
+    def finish(self):
+        if (
+            len(self.actions) == 1
+            and self.actions[0][1] is not None
+            and SEND_QUEUE.take_token(self.actions[0][1]["chat_id"])
+        ):
+            _, webhook_call, future = self.actions[0]
+            # Telegram does not tell the result of a call made this way
+            future.set_result(None)
+            return webhook_call
+        self.send_all()
+        return None
+
+    def send_all(self):
+        for send, _, future in self.actions:
+            try:
+                sent = send()
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            sent.add_done_callback(lambda sent, future=future: _copy_result(sent, future))
+        self.actions = []
+
+
+class CommandRouter:
+    def __init__(self):
+        self.commands = {}
+        self.descriptions = {}
+        self.document_handler = None
+        self.fallback_handler = None
+        self.inline = set()  # Names of the commands that may reply in the webhook response
+        self.message_hooks = []
+        self.lazy = {}  # Command name (or "document") -> plugin module not imported yet
+        self.loaded_plugins = {}  # Plugin module -> seconds its import took
+        self._plugins_lock = threading.Lock()
+
+    def command(self, *names, description=None, inline=False):
+        """
+        Registers the decorated function for one or more command names.
+        inline=True marks a command that only replies through ctx.reply()
+        and never waits for upstream APIs, see Outbox.
+        """
+
+        def decorator(func):
+            for name in names:
+                name = name.lower()
+                if name in self.commands:
+                    raise ValueError(f"Command {name} is registered twice.")
+                self.commands[name] = func
+                if description:
+                    self.descriptions[name] = description
+                if inline:
+                    self.inline.add(name)
+            return func
+
+        return decorator
+
+    def on_document(self, func):
+        self.document_handler = func
+        return func
+
+    def fallback(self, func=None, inline=False):
+        def decorator(func):
+            self.fallback_handler = func
+            if inline:
+                self.inline.add("fallback")
+            return func
+
+        return decorator(func) if func is not None else decorator
+
+    def on_message(self, func):
+        """
+        Registers a function called with every message before it is dispatched.
+        """
+        self.message_hooks.append(func)
+        return func
+
+    def plugin(self, module, *names, document=False):
+        """
+        Declares commands (and the document handler) that `module` registers
+        when it is imported. It is imported the first time one of them is used.
+        """
+        for name in names:
+            self.lazy[name.lower()] = module
+        if document:
+            self.lazy["document"] = module
+
+    def load_plugin(self, module):
+        """
+        Imports a plugin module unless it was imported already.
+        """
+        with self._plugins_lock:
+            if module in self.loaded_plugins:
+                return
+            started = time.perf_counter()
+            importlib.import_module(module)
+            self.loaded_plugins[module] = time.perf_counter() - started
+            for name in [name for name, owner in self.lazy.items() if owner == module]:
+                del self.lazy[name]
+        print(f"Loaded {module} in {self.loaded_plugins[module] * 1000:.0f} ms")
+
+    def resolve(self, ctx, load=True):
+        """
+        Returns (name, handler) for a context, name labels the metrics.
+        With load=False plugins are not imported and their handler is None.
+        """
+        if ctx.command is not None:
+            module = self.lazy.get(ctx.command)
+            if module is not None:
+                if not load:
+                    return ctx.command, None
+                self.load_plugin(module)
+            handler = self.commands.get(ctx.command)
+            if handler is not None:
+                return ctx.command, handler
+        if ctx.document:
+            module = self.lazy.get("document")
+            if module is not None:
+                if not load:
+                    return "document", None
+                self.load_plugin(module)
+            if self.document_handler is not None:
+                return "document", self.document_handler
+        return "fallback", self.fallback_handler
+
+    def is_inline(self, update):
+        """
+        True when the update goes to a command registered with inline=True.
+        """
+        message = update.get("message")
+        if not message or not self.inline:
+            return False
+        # Plugins are imported by the worker that runs them, not here
+        name, _ = self.resolve(CommandContext(update, message), load=False)
+        return name in self.inline
+
+    def dispatch_inline(self, update):
+        """
+        Runs the handler with its replies held back. Returns the Bot API call
+        to put in the webhook response, or None when the replies were sent.
+        """
+        outbox = Outbox()
+        try:
+            self.dispatch(update, outbox)
+        except Exception:
+            outbox.send_all()
+            raise
+        return outbox.finish()
+
+    def dispatch(self, update, outbox=None):
+        message = update.get("message")
+        if not message:
+            return None
+
+        ctx = CommandContext(update, message, outbox)
+        for hook in self.message_hooks:
+            hook(ctx)
+
+        name, handler = self.resolve(ctx)
+        if handler is None:
+            return None
+
+        started = time.perf_counter()
+        try:
+            return handler(ctx)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    def _record(self, name, elapsed):
+        UPDATES.inc(name)
+        HANDLER_SECONDS.observe(elapsed, name)
+
+
+ROUTER = CommandRouter()
@@ -0,0 +1,78 @@
+"""
+Settings of the bot, read from the environment (.env file).
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+if not BOT_TOKEN:
+    raise ValueError("BOT_TOKEN not found. Please set it in .env file.")
+
+# The API keys are checked by the plugin that uses them when it is loaded
+# (see check_keys), so a bot that never gets /news does not need NEWS_API_KEY
+NEWS_API_KEY = os.getenv("NEWS_API_KEY")  # Get from https://newsapi.org/register
+CRIC_KEY = os.getenv("CRIC_KEY")  # Get from https://cricketdata.org/signup.aspx
+OMDB_KEY = os.getenv("OMDB_KEY")  # Get from https://www.omdbapi.com/apikey.aspx
+
+"""
+Follow these steps to get your API key:
+
+1️⃣ Go to https://home.openweathermap.org/users/sign_up and sign up.
+2️⃣ Log in to your account.
+3️⃣ Navigate to the "API keys" section.
+4️⃣ Click on "Generate a new key" and give it a name.
+5️⃣ Copy the generated API key and use it.
+
+🔹 Note: It may take a few hours for the API key to activate.
+🔹 Free-tier API has rate limits, so use it wisely!
+"""
+OPEN_WEATHER_KEY = os.getenv("OPEN_WEATHER_KEY")
+
+# Optional: lets /github look up several users and repos with one GraphQL
+# request and raises the REST limit from 60 to 5000 requests per hour.
+# Create one at https://github.com/settings/tokens (no scopes needed)
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/"
+FILE_URL = f"https://api.telegram.org/file/bot{BOT_TOKEN}/"
+# The key is sent in the X-Api-Key header, not in the URL
+NEWS_URL = "https://newsapi.org/v2/top-headlines"
+
+# Telegram user ids allowed to use /stats, comma separated
+ADMIN_USER_IDS = {
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()
+}
+
+# Number of updates handled at the same time (messages of one chat stay in order)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+
+# Uploaded files bigger than this are not downloaded (the Bot API allows 20 MB)
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_MB", "20")) * 1024 * 1024
+
+# getUpdates settings: seconds to wait for new updates, max updates per call
+# and the update types the bot handles (others are not even sent by Telegram)
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "50"))
+POLL_LIMIT = min(100, int(os.getenv("POLL_LIMIT", "100")))
+ALLOWED_UPDATES = ["message"]
+
+# How long (seconds) replies from each upstream API are cached, and for how long
+# an expired reply may still be sent while a fresh one is fetched in the background
+CACHE_TTL = {
+    "openweather": (600, 1800),
+    "github": (300, 3600),
+    "omdb": (86400, 86400),
+    "cricapi_players": (3600, 86400),
+}
+
+
+def check_keys(*names):
+    """
+    Prints a hint for every API key in `names` that is not set.
+    """
+    for name in names:
+        if not globals().get(name):
+            print(f"{name} not found. Please set it in .env file.")
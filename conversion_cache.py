@@ -0,0 +1,121 @@
+"""
+Remembers what the bot sent back for an uploaded file.
+
+Telegram gives every file a `file_unique_id` that stays the same when the file
+is forwarded or sent again. The replies produced for it (the file_id of the
+converted document, or the extracted text messages) are kept by that id and
+the target format, so a repeated upload is answered by re-sending them:
+no download, no conversion and no upload.
+"""
+
+import os
+import threading
+
+from metrics import METRICS
+from response_cache import ResponseCache, cache_metrics
+
+FILE_CACHE_MAX_ENTRIES = int(os.getenv("FILE_CACHE_MAX_ENTRIES", "2048"))
+# Telegram file_ids of sent documents stay valid, this only limits stale entries
+FILE_CACHE_TTL = int(os.getenv("FILE_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+class ConversionCache:
+    def __init__(self, max_entries=FILE_CACHE_MAX_ENTRIES, ttl=FILE_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = ResponseCache(max_entries)
+
+    def get(self, file_unique_id, target):
+        """
+        Returns the list of recorded replies, or None.
+        """
+        if not file_unique_id:
+            return None
+        return self._cache.get(("conversions", file_unique_id, target))
+
+    def put(self, file_unique_id, target, replies):
+        if file_unique_id and replies:
+            self._cache.put(("conversions", file_unique_id, target), replies, self.ttl)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class ReplyRecorder:
+    """
+    Sends replies for a conversion and records them for the cache.
+
+    Text replies are recorded as ("text", text). Documents are recorded as
+    ("document", file_id, filename, caption) once Telegram answered the upload,
+    which happens on a send queue thread, so saving waits for that.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.replies = []
+        self.failed = False
+        self._save_to = None
+        self._saved = False
+        self._lock = threading.Lock()
+
+    def text(self, text):
+        self.replies.append(("text", text))
+        return self.ctx.reply(text, parse_mode=None)
+
+    def document(self, document, filename, caption=None):
+        with self._lock:
+            index = len(self.replies)
+            self.replies.append(None)  # Keeps the order until the file_id is known
+        future = self.ctx.reply_document(document, filename, caption=caption)
+
+        def remember(done):
+            try:
+                file_id = done.result()["result"]["document"]["file_id"]
+                with self._lock:
+                    self.replies[index] = ("document", file_id, filename, caption)
+            except Exception:
+                self.failed = True
+            self._try_save()
+
+        future.add_done_callback(remember)
+        return future
+
+    def save_when_sent(self, cache, file_unique_id, target):
+        """
+        Stores the replies in `cache` as soon as every upload has finished.
+        Nothing is stored when a reply failed.
+        """
+        self._save_to = (cache, file_unique_id, target)
+        self._try_save()
+
+    def _try_save(self):
+        with self._lock:
+            if self._save_to is None or self._saved or self.failed:
+                return
+            if any(reply is None for reply in self.replies):
+                return
+            self._saved = True
+            replies = list(self.replies)
+        cache, file_unique_id, target = self._save_to
+        cache.put(file_unique_id, target, replies)
+
+
+def replay(ctx, replies):
+    """
+    Sends recorded replies again, documents by their file_id.
+    """
+    for reply in replies:
+        if reply[0] == "text":
+            ctx.reply(reply[1], parse_mode=None)
+        else:
+            _, file_id, filename, caption = reply
+            ctx.reply_document(file_id, filename, caption=caption)
+
+
+CONVERSIONS = ConversionCache()
+
+METRICS.counter_callback(
+    "bot_file_cache_lookups_total",
+    "Converted file cache lookups per result",
+    lambda: cache_metrics(CONVERSIONS),
+    ("cache", "result"),
+)
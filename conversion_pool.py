@@ -0,0 +1,251 @@
+"""
+Runs CPU heavy file conversions (Pillow, PyPDF2) in separate worker processes.
+
+Converting a big image or PDF in the bot process holds the GIL and stalls every
+other chat. Here a fixed number of worker processes do that work instead. Each
+job has a timeout after which its worker is killed and replaced, every worker
+runs with a memory cap (where the OS supports it), and only a limited number of
+jobs may wait for a free worker; past that the caller gets PoolBusy right away.
+
+Jobs name their function as "module:function" so nothing but plain data has to
+be pickled. A job whose function is a generator streams its items back while it
+runs, which is how PDF pages reach the chat before the whole file is parsed.
+"""
+
+import importlib
+import inspect
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows, no memory cap there
+    resource = None
+
+from metrics import METRICS
+
+CONVERT_WORKERS = int(
+    os.getenv("CONVERT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+)
+CONVERT_MAX_QUEUED = int(os.getenv("CONVERT_MAX_QUEUED", "8"))
+CONVERT_TIMEOUT = float(os.getenv("CONVERT_TIMEOUT", "60"))
+CONVERT_MEMORY_MB = int(os.getenv("CONVERT_MEMORY_MB", "1024"))
+
+
+class PoolBusy(Exception):
+    """Too many conversions are already waiting."""
+
+
+class JobFailed(Exception):
+    """The job raised, timed out or its worker died."""
+
+
+def _worker_main(conn, memory_mb):
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            print(f"Could not set conversion memory cap: {e}")
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        target, args = job
+        try:
+            module_name, func_name = target.split(":")
+            func = getattr(importlib.import_module(module_name), func_name)
+            result = func(*args)
+            if inspect.isgenerator(result):
+                for item in result:
+                    conn.send(("item", item))
+                conn.send(("done", None))
+            else:
+                conn.send(("result", result))
+        except MemoryError:
+            conn.send(("error", "the file needs too much memory to convert"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, memory_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class ConversionPool:
+    def __init__(
+        self,
+        workers=CONVERT_WORKERS,
+        max_queued=CONVERT_MAX_QUEUED,
+        timeout=CONVERT_TIMEOUT,
+        memory_mb=CONVERT_MEMORY_MB,
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        # Jobs running plus jobs waiting may not exceed this
+        self._slots = threading.BoundedSemaphore(self.workers + max_queued)
+        self._idle = queue.Queue()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._stats = {}
+
+    def _start(self):
+        with self._start_lock:
+            if not self._started:
+                for _ in range(self.workers):
+                    self._idle.put(_Worker(self._ctx, self.memory_mb))
+                self._started = True
+
+    def _record(self, target, name, seconds):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                target,
+                {
+                    "jobs": 0,
+                    "failed": 0,
+                    "wall_total": 0.0,
+                    "wall_max": 0.0,
+                    "wait_total": 0.0,
+                    "wait_max": 0.0,
+                },
+            )
+            if name == "failed":
+                stats["failed"] += 1
+                return
+            if name == "wall":
+                stats["jobs"] += 1
+            stats[f"{name}_total"] += seconds
+            stats[f"{name}_max"] = max(stats[f"{name}_max"], seconds)
+
+    def stream(self, target, *args, timeout=None):
+        """
+        Runs `target` ("module:function") in a worker and yields its items
+        (or its single result). Raises PoolBusy when the queue is full and
+        JobFailed when the job fails or runs longer than `timeout` seconds.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            self._start()
+            queued_at = time.monotonic()
+            with self._stats_lock:
+                self._queued += 1
+            try:
+                worker = self._idle.get()
+            finally:
+                with self._stats_lock:
+                    self._queued -= 1
+            started = time.monotonic()
+            self._record(target, "wait", started - queued_at)
+            limit = timeout or self.timeout
+            deadline = started + limit
+            healthy = False  # The worker finished the job and can be reused
+            finished = False  # ... and the job succeeded
+            try:
+                worker.conn.send((target, args))
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not worker.conn.poll(remaining):
+                        raise JobFailed(f"took longer than {limit:.0f} seconds")
+                    kind, value = worker.conn.recv()
+                    if kind == "item":
+                        yield value
+                        continue
+                    healthy = True
+                    if kind == "error":
+                        raise JobFailed(value)
+                    finished = True
+                    if kind == "result":
+                        yield value
+                    break
+            except (EOFError, OSError) as e:
+                # The worker died, most likely the memory cap was hit
+                raise JobFailed("the conversion process crashed") from e
+            finally:
+                if not healthy:
+                    # Timed out, crashed or the caller stopped reading while
+                    # the worker may still be busy: replace it
+                    worker.kill()
+                    worker = _Worker(self._ctx, self.memory_mb)
+                self._idle.put(worker)
+                if finished:
+                    self._record(target, "wall", time.monotonic() - started)
+                else:
+                    self._record(target, "failed", 0)
+        finally:
+            self._slots.release()
+
+    def run(self, target, *args, timeout=None):
+        """
+        Runs a job that returns a single value and returns it.
+        """
+        for value in self.stream(target, *args, timeout=timeout):
+            return value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {target: dict(values) for target, values in self._stats.items()}
+            queued = self._queued
+        for values in stats.values():
+            jobs = values["jobs"]
+            done = jobs + values["failed"]
+            wall_total = values.pop("wall_total")
+            wait_total = values.pop("wait_total")
+            values["wall_avg"] = wall_total / jobs if jobs else 0.0
+            values["wait_avg"] = wait_total / done if done else 0.0
+        return {"workers": self.workers, "queued": queued, "jobs": stats}
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(2)
+            if worker.process.is_alive():
+                worker.kill()
+
+
+POOL = ConversionPool()
+
+METRICS.gauge_callback(
+    "bot_conversion_queue_depth",
+    "Conversions waiting for a free worker process",
+    lambda: POOL.stats()["queued"],
+)
+METRICS.counter_callback(
+    "bot_conversions_total",
+    "Conversion jobs per function and result",
+    lambda: {
+        (target, result): values[result]
+        for target, values in POOL.stats()["jobs"].items()
+        for result in ("jobs", "failed")
+    },
+    ("target", "result"),
+)
@@ -0,0 +1,138 @@
+"""
+Country name -> ISO alpha-2 code lookup for /weather.
+
+pycountry.countries.get(name=...) only matches the exact official name, so
+"USA", "UK" or "Russia" were rejected. This builds one dict, on first use, of
+every spelling we accept: names, common and official names, alpha-2/alpha-3
+codes and a list of everyday aliases, all casefolded and without accents or
+punctuation. Lookups are a dict access, with a difflib fallback for typos.
+"""
+
+import difflib
+import functools
+import re
+import threading
+import unicodedata
+
+# Everyday names that pycountry does not know
+ALIASES = {
+    "usa": "US",
+    "us": "US",
+    "america": "US",
+    "united states of america": "US",
+    "uk": "GB",
+    "britain": "GB",
+    "great britain": "GB",
+    "england": "GB",
+    "scotland": "GB",
+    "wales": "GB",
+    "northern ireland": "GB",
+    "russia": "RU",
+    "south korea": "KR",
+    "korea": "KR",
+    "north korea": "KP",
+    "iran": "IR",
+    "syria": "SY",
+    "vietnam": "VN",
+    "laos": "LA",
+    "bolivia": "BO",
+    "venezuela": "VE",
+    "tanzania": "TZ",
+    "moldova": "MD",
+    "czech republic": "CZ",
+    "ivory coast": "CI",
+    "holland": "NL",
+    "the netherlands": "NL",
+    "uae": "AE",
+    "emirates": "AE",
+    "taiwan": "TW",
+    "palestine": "PS",
+    "vatican": "VA",
+    "macedonia": "MK",
+    "burma": "MM",
+    "swaziland": "SZ",
+    "turkey": "TR",
+    "drc": "CD",
+    "congo": "CG",
+}
+
+# Fuzzy matches below this similarity are not trusted
+FUZZY_CUTOFF = 0.85
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """
+    "Côte d'Ivoire" -> "cote divoire": accents removed, casefolded,
+    punctuation dropped and whitespace collapsed.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = re.sub(r"[^\w\s]", "", stripped.casefold())
+    return " ".join(cleaned.split())
+
+
+def _add(index, name, alpha_2):
+    key = normalize_name(name)
+    if key:
+        index.setdefault(key, alpha_2)
+
+
+def build_index():
+    import pycountry  # Only needed the first time /weather is used
+
+    index = {}
+    for country in pycountry.countries:
+        alpha_2 = country.alpha_2
+        for field in ("name", "common_name", "official_name"):
+            value = getattr(country, field, None)
+            if value:
+                _add(index, value, alpha_2)
+                # "Korea, Republic of" -> also "Republic of Korea"
+                if ", " in value:
+                    head, tail = value.split(", ", 1)
+                    _add(index, f"{tail} {head}", alpha_2)
+        _add(index, alpha_2, alpha_2)
+        _add(index, country.alpha_3, alpha_2)
+
+    for alias, alpha_2 in ALIASES.items():
+        # Aliases win over codes, "us" is a country and not a pronoun here anyway
+        index[normalize_name(alias)] = alpha_2
+    return index
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+@functools.lru_cache(maxsize=1024)
+def lookup_country(country_name):
+    """
+    Returns the alpha-2 code for a country name, or None.
+    """
+    index = get_index()
+    key = normalize_name(country_name)
+    code = index.get(key)
+    if code is not None or len(key) < 4:
+        return code
+    match = difflib.get_close_matches(key, index.keys(), n=1, cutoff=FUZZY_CUTOFF)
+    return index[match[0]] if match else None
+
+
+@functools.lru_cache(maxsize=1024)
+def resolve_location(city, country):
+    """
+    Returns (city, alpha_2) ready for the OpenWeather query, or None when
+    the country is unknown. Results are cached per (city, country) pair.
+    """
+    code = lookup_country(country)
+    if code is None:
+        return None
+    return " ".join(city.split()).title(), code
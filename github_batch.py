@@ -0,0 +1,113 @@
+"""
+Looks up several GitHub users and repositories with one GraphQL request.
+
+/github accepts many targets at once. With a GITHUB_TOKEN they are all
+resolved by a single query that uses one alias per target, instead of one
+REST call each (the GraphQL API does not accept anonymous requests). The
+results are converted to the fields of the REST answers, so plugins/github.py
+formats both the same way.
+"""
+
+import http_client
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# Targets one /github command may ask for
+GITHUB_MAX_TARGETS = 10
+
+USER_FIELDS = """
+    login
+    url
+    repositories(privacy: PUBLIC, ownerAffiliations: OWNER) { totalCount }
+    ... on User { followers { totalCount } }
+"""
+REPO_FIELDS = """
+    name
+    url
+    stargazerCount
+    forkCount
+    updatedAt
+"""
+
+
+def parse_targets(words):
+    """
+    Turns the /github arguments into ("user", name) and ("repo", "owner/repo")
+    targets. "repo" before a path is optional, duplicates are dropped.
+    """
+    if len(words) == 1:
+        kind = "repo" if "/" in words[0] else "user"
+        return [(kind, words[0].lower())]
+    targets = []
+    for word in words:
+        if word.lower() == "repo":
+            continue
+        path = word.strip("/").lower()
+        if path.count("/") > 1 or not path:
+            raise ValueError(word)
+        targets.append(("repo" if "/" in path else "user", path))
+    return list(dict.fromkeys(targets))
+
+
+def build_query(targets):
+    """
+    Returns (query, variables) with the alias t<N> for the N-th target.
+    """
+    params = []
+    fields = []
+    variables = {}
+    for n, (kind, name) in enumerate(targets):
+        if kind == "user":
+            params.append(f"$login{n}: String!")
+            variables[f"login{n}"] = name
+            fields.append(f"t{n}: repositoryOwner(login: $login{n}) {{{USER_FIELDS}}}")
+        else:
+            owner, repo = name.split("/", 1)
+            params += [f"$owner{n}: String!", f"$name{n}: String!"]
+            variables.update({f"owner{n}": owner, f"name{n}": repo})
+            fields.append(f"t{n}: repository(owner: $owner{n}, name: $name{n}) {{{REPO_FIELDS}}}")
+    query = f"query({', '.join(params)}) {{\n" + "\n".join(fields) + "\n}"
+    return query, variables
+
+
+def rest_fields(kind, node):
+    """
+    Converts a GraphQL user or repository to the fields of the REST answer.
+    """
+    if kind == "user":
+        return {
+            "login": node["login"],
+            "html_url": node["url"],
+            "public_repos": node["repositories"]["totalCount"],
+            "followers": (node.get("followers") or {}).get("totalCount", 0),
+        }
+    return {
+        "name": node["name"],
+        "html_url": node["url"],
+        "stargazers_count": node["stargazerCount"],
+        "forks_count": node["forkCount"],
+        "updated_at": node["updatedAt"],
+    }
+
+
+def fetch_batch(targets, token):
+    """
+    Returns {target: REST-like dict, or None when it does not exist}.
+
+    Raises requests.exceptions.RequestException or ValueError when the query
+    as a whole failed, so the caller can fall back to REST.
+    """
+    query, variables = build_query(targets)
+    response = http_client.post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"bearer {token}"},
+    )
+    response.raise_for_status()
+    data = response.json().get("data")
+    if data is None:
+        raise ValueError("GitHub GraphQL query returned no data")
+    results = {}
+    for n, target in enumerate(targets):
+        node = data.get(f"t{n}")
+        results[target] = rest_fields(target[0], node) if node else None
+    return results
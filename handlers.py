@@ -0,0 +1,303 @@
+"""
+The bot's core commands. Both long-polling.py and webhook.py dispatch updates
+to the handlers registered here on ROUTER, so both modes support the same commands.
+Commands with heavy dependencies or background threads are plugins, imported
+on first use (see plugins/__init__.py).
+"""
+
+# Built-in modules
+import html
+import random
+import time
+
+# Third-party modules
+import requests
+
+# Local modules
+import http_client
+import plugins  # Declares the plugin commands on ROUTER
+import response_cache  # Its metrics are read by /stats
+from chat_history import HISTORY
+from commands import ROUTER
+from config import ADMIN_USER_IDS
+from metrics import METRICS
+
+greetings = ["Hello!", "Hi there!", "Greetings!", "Salutations!", "Howdy!"]
+
+moods = [
+    "😊 Happy: Because you're here, and that's all I need!",
+    "😔 Sad: Feeling a little down... but your message just made it better!",
+    "😠 Angry: Ugh! Someone tested my patience today. But you? You're my peace. 😌",
+    "🤩 Excited: Ahh! You're here! U made my  day! 🎉",
+]
+
+
+def get_joke():
+    """
+    This function uses and API to fetch an joke from the joke API
+    It basically provides us with a python dictionary that has keys like type, setup and punchline which contains specific string (or we can say the main content or joke)
+    This data will be called to show up the joke as I did in line 43 of code
+    """
+    joke_url = "https://official-joke-api.appspot.com/jokes/random"
+    try:
+        response = http_client.get(joke_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching joke: {e}")
+        response = None
+    if response is not None and response.status_code == 200:
+        joke_data = response.json()
+        return f"{joke_data['setup']}\n{joke_data['punchline']}"
+    return "Sorry, I couldn't fetch a joke at the moment."
+
+
+def get_dog_fact():
+    """
+    This function fetches a random dog fact from the Dog API.
+    It returns the first fact from the API response.
+    """
+    dog_fact_url = "https://dog-api.kinduff.com/api/facts"
+    try:
+        response = http_client.get(dog_fact_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching dog fact: {e}")
+        response = None
+    if response is not None and response.status_code == 200:
+        data = response.json()
+        return data.get("facts", ["No fact available"])[
+            0
+        ]  # Safely fetching the first fact
+    return "Sorry, I couldn't fetch a dog fact at the moment."
+
+
+def get_cat_image():
+    """
+    Gets the URL of a cat photo from the Cat API, or None when it is not reachable
+    """
+    cat_api_url = "https://api.thecatapi.com/v1/images/search"
+    try:
+        response = http_client.get(cat_api_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching cat image: {e}")
+        return None
+    if response.status_code == 200:
+        cat_data = response.json()
+        return cat_data[0]["url"]
+    return None
+
+
+def get_kkr_history():
+    return (
+        "🏏 <b>History of Kolkata Knight Riders (KKR)</b>\n\n"
+        "📅 <b>Founded:</b> 2008\n"
+        "🎭 <b>Owners:</b> Red Chillies Entertainment & Mehta Group\n"
+        "🏟 <b>Home Ground:</b> Eden Gardens, Kolkata\n\n"
+        "🏆 <b>IPL Titles:</b> 2012, 2014, 2024\n"
+        "📜 <b>Legacy:</b> KKR is known for its passionate fanbase, unique playing style, and never-give-up attitude!\n\n"
+        "🔗 <a href='https://www.kkr.in/'>Official Website</a>"
+    )
+
+
+def get_help_message():
+    """
+    Returns a help message listing all available commands and their usage.
+    """
+    return (
+        "📌 <b>Available Commands:</b>\n\n"
+        "🔹 <b>/start</b> - Start the bot and receive a greeting\n"
+        "🔹 <b>/help</b> - Display this help message\n"
+        "🔹 <b>/mood</b> - Get a random bot mood\n\n"
+        "📰 <b>News & Information:</b>\n"
+        "🔹 <b>/news [category] [country]</b> - Get the latest news headlines\n"
+        "🔹 <b>/weather City, Country</b> - Get current weather updates\n\n"
+        "😂 <b>Fun & Entertainment:</b>\n"
+        "🔹 <b>/joke</b> - Get a random joke\n"
+        "🔹 <b>/cat</b> - Get a random cat image\n\n"
+        "🛠 <b>Utilities & API-Based:</b>\n"
+        "🔹 <b>/github &lt;username&gt;</b> - Get GitHub user details (profile, repos, followers)\n"
+        "🔹 <b>/github repo &lt;owner/repo&gt;</b> - Get GitHub repository details (stars, forks, last update)\n"
+        "🔹 <b>/github &lt;user&gt; &lt;owner/repo&gt; ...</b> - Compare several users and repositories at once\n"
+        "🔹 <b>/devian &lt;roll_no&gt; [roll_no ...]</b> - Get Devians details using roll numbers\n\n"
+        "🏏 <b>Cricket & IPL:</b>\n"
+        "🔹 <b>/ipl</b> - Get history and details about Kolkata Knight Riders (KKR)\n"
+        "🔹 <b>/iplstats &lt;player_name&gt;</b> - Get KKR player's statistics\n\n"
+        "📁 <b>File Processing:</b>\n"
+        "🔹 <b>Upload an Image</b> - Convert between PNG and JPEG formats (add the caption <i>png</i>, <i>jpeg</i> or <i>webp</i> to pick one)\n"
+        "🔹 <b>Upload a PDF</b> - Extract text from the PDF file\n\n"
+        "ℹ️ <i>Type a command or send a file to get started!</i>"
+    )
+
+
+def _seconds(value):
+    if value is None:
+        return "-"
+    return "&gt;30s" if value == float("inf") else f"{value:g}s"
+
+
+def get_stats_message():
+    """
+    Summarizes METRICS for the /stats admin command.
+    """
+    uptime = int(time.time() - METRICS.get("bot_start_time_seconds").values()[()])
+    updates = METRICS.get("bot_updates_total").values()
+    errors = METRICS.get("bot_handler_errors_total").values()
+    handler_seconds = METRICS.get("bot_handler_seconds")
+    lines = [
+        "📊 <b>Bot stats</b>\n",
+        f"⏱ Uptime: {uptime // 3600}h {uptime % 3600 // 60}m",
+        f"📨 Updates: {int(sum(updates.values()))}, handler errors: {int(sum(errors.values()))}\n",
+        "<b>Commands</b> (count, p50 / p99):",
+    ]
+    for (command,), count in sorted(updates.items(), key=lambda item: -item[1])[:10]:
+        p50 = _seconds(handler_seconds.quantile(0.5, command))
+        p99 = _seconds(handler_seconds.quantile(0.99, command))
+        lines.append(f"🔹 {html.escape(command)}: {int(count)} ({p50} / {p99})")
+
+    lines.append("\n<b>Upstreams</b> (calls, failed, p99):")
+    calls = {}
+    for (host, outcome), count in METRICS.get("bot_upstream_requests_total").values().items():
+        total, failed = calls.get(host, (0, 0))
+        failed += count if outcome in ("error", "5xx") else 0
+        calls[host] = (total + count, failed)
+    upstream_seconds = METRICS.get("bot_upstream_seconds")
+    for host, (total, failed) in sorted(calls.items()):
+        p99 = _seconds(upstream_seconds.quantile(0.99, host))
+        lines.append(f"🔹 {host}: {int(total)}, {int(failed)} failed, {p99}")
+
+    sends = {result: int(count) for (result,), count in METRICS.get("bot_sends_total").values().items()}
+    lines.append(
+        f"\n📤 Sent: {sends.get('sent', 0)}, failed: {sends.get('failed', 0)}, "
+        f"retried: {sends.get('retried', 0)}, rate limited: {sends.get('rate_limited', 0)}"
+    )
+
+    hit_rates = []
+    lookups = METRICS.get("bot_cache_lookups_total").values()
+    for upstream in sorted({upstream for upstream, _ in lookups}):
+        hits = lookups.get((upstream, "hits"), 0) + lookups.get((upstream, "stale_hits"), 0)
+        total = hits + lookups.get((upstream, "misses"), 0)
+        if total:
+            hit_rates.append(f"{upstream} {hits / total:.0%}")
+    lines.append(f"🗃 Cache hit rate: {', '.join(hit_rates) or '-'}")
+    coalesced = METRICS.get("bot_coalesced_calls_total").values()
+    lines.append(f"🔗 Lookups sharing an in-flight call: {int(sum(coalesced.values()))}")
+
+    depths = []
+    for name, label in (
+        ("bot_updates_pending", "updates"),
+        ("bot_send_queue_depth", "sends"),
+        ("bot_conversion_queue_depth", "conversions"),
+        ("bot_history_write_queue_depth", "history"),
+    ):
+        metric = METRICS.get(name)
+        if metric is not None:
+            depths.append(f"{label} {int(sum(metric.values().values()))}")
+    lines.append(f"📥 Queued: {', '.join(depths)}")
+    return "\n".join(lines)
+
+
+# This will give a random fun fact
+def get_fun_fact():
+    """
+    Fetches a random fun fact.
+    Returns the fact as a string.
+    """
+    fact_url = "https://uselessfacts.jsph.pl/random.json?language=en"
+    try:
+        response = http_client.get(fact_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching fun fact: {e}")
+        response = None
+
+    if response is not None and response.status_code == 200:
+        data = response.json()
+        return f"🤓 <b>Did You Know?</b>\n{data['text']}"
+    return "❌ Unable to fetch a fun fact at the moment."
+
+
+def record_message(message):
+    """
+    Stores every message so it can be downloaded later with /export
+    """
+    chat_id = message.get("chat", {}).get("id")
+    user = message.get("from", {}).get("first_name", "Unknown")
+    HISTORY.record(chat_id, message.get("date"), user, message.get("text", ""))
+
+
+# Add your command in this block by using @ROUTER.command
+@ROUTER.on_message
+def store_history(ctx):
+    record_message(ctx.message)
+
+
+@ROUTER.command("/start", inline=True)
+def start_command(ctx):
+    greeting = random.choice(greetings)
+    ctx.reply(greeting)
+
+
+@ROUTER.command("/fact")
+def fact_command(ctx):
+    fact = get_fun_fact()
+    ctx.reply(fact)
+
+
+@ROUTER.command("/joke")
+def joke_command(ctx):
+    """
+    This block checks if the command /joke is typed by the user while using the bot and helps us to send the joke
+    """
+    joke = get_joke()
+    ctx.reply(joke)
+
+
+@ROUTER.command("/cat")
+def cat_command(ctx):
+    """
+    It will give a random cat image
+    """
+    cat_image_url = get_cat_image()
+    if cat_image_url is None:
+        ctx.reply("Sorry, The cats are sleeping, try again later")
+        return
+    ctx.reply_photo(cat_image_url, caption="Here's a awe-some cat for you!")
+
+
+@ROUTER.command("/ipl", inline=True)
+def ipl_command(ctx):
+    ctx.reply(get_kkr_history())
+
+
+@ROUTER.command("/dogfact")
+def dogfact_command(ctx):
+    dog_fact = get_dog_fact()
+    ctx.reply(dog_fact)
+
+
+@ROUTER.command("/stats")
+def stats_command(ctx):
+    """
+    Usage counters, latencies and queue depths, only for ADMIN_USER_IDS.
+    """
+    if ctx.message.get("from", {}).get("id") not in ADMIN_USER_IDS:
+        ctx.reply("⛔ /stats is only available to the bot's admins.")
+        return
+    ctx.reply(get_stats_message())
+
+
+@ROUTER.command("/help", inline=True)
+def help_command(ctx):
+    """
+    Sends a list of available commands when the user types /help
+    """
+    help_message = get_help_message()
+    ctx.reply(help_message)
+
+
+@ROUTER.command("/mood", inline=True)
+def mood_command(ctx):
+    mood = random.choice(moods)
+    ctx.reply(mood)
+
+
+@ROUTER.fallback(inline=True)
+def invalid_message(ctx):
+    ctx.reply("Invalid message")
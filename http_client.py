@@ -0,0 +1,324 @@
+"""
+Shared HTTP client used for every call the bot makes (Telegram and all upstream APIs).
+
+All requests go through one requests.Session, so TCP and TLS connections are kept
+alive and reused instead of being opened again for every command. Every host gets
+its own connection pool, Telegram gets a bigger one because every reply goes there.
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from metrics import METRICS
+
+# (connect, read) timeout in seconds used when a caller does not pass one
+DEFAULT_TIMEOUT = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "20")),
+)
+# How many different hosts keep a pool, and how many connections each pool keeps
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+
+# "host=http://127.0.0.1:8080/prefix,..." sends every request for `host` to
+# another base URL instead, e.g. to the local stand-ins of benchmarks/loadtest.py
+HTTP_HOST_OVERRIDES = dict(
+    item.strip().split("=", 1)
+    for item in os.getenv("HTTP_HOST_OVERRIDES", "").split(",")
+    if "=" in item
+)
+
+# Hosts that need a bigger (or smaller) pool than HTTP_POOL_MAXSIZE
+HOST_POOL_SIZES = {
+    "api.telegram.org": int(os.getenv("TELEGRAM_POOL_MAXSIZE", "32")),
+}
+
+# (connect, read) deadline per upstream, used when the caller does not pass a
+# timeout. A reply that is slower than this is worse than no reply.
+HOST_TIMEOUTS = {
+    "official-joke-api.appspot.com": (3, 5),
+    "dog-api.kinduff.com": (3, 5),
+    "uselessfacts.jsph.pl": (3, 5),
+    "api.thecatapi.com": (3, 5),
+    "api.openweathermap.org": (3, 8),
+    "www.omdbapi.com": (3, 8),
+    "api.github.com": (3, 8),
+    "www.themealdb.com": (3, 10),
+    "api.cricapi.com": (5, 10),
+    "newsapi.org": (5, 10),
+    "raw.githubusercontent.com": (5, 15),
+}
+
+# Telegram is not behind a breaker: send_queue already retries and backs off,
+# and failing getUpdates fast would only make the poll loop spin.
+NO_BREAKER_HOSTS = {"api.telegram.org"}
+
+# Successful GET responses remembered per URL, served while a breaker is open.
+# A served copy has `from_last_good = True` and `last_good_at` (unix time it was
+# fetched), so callers that track freshness can keep their old timestamps.
+LAST_GOOD_MAX_ENTRIES = int(os.getenv("LAST_GOOD_MAX_ENTRIES", "512"))
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling a host whose breaker is open, when there is no
+    earlier response to serve.
+    """
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies DEFAULT_TIMEOUT to requests sent without a timeout.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+_adapters = {}
+_request_counts = defaultdict(int)
+_error_counts = defaultdict(int)
+_counts_lock = threading.Lock()
+_breakers = {}
+_breakers_lock = threading.Lock()
+_last_good = OrderedDict()  # key -> (response, unix time it was fetched)
+_last_good_lock = threading.Lock()
+_replays = threading.local()
+
+UPSTREAM_REQUESTS = METRICS.counter(
+    "bot_upstream_requests_total",
+    "HTTP calls per host and outcome (status class or error)",
+    ("host", "outcome"),
+)
+UPSTREAM_SECONDS = METRICS.histogram(
+    "bot_upstream_seconds", "Time until the response headers arrived, per host", ("host",)
+)
+BREAKER_SHORTCUTS = METRICS.counter(
+    "bot_circuit_short_circuits_total",
+    "Calls not sent because the host's breaker was open, by what was returned",
+    ("host", "result"),
+)
+
+
+def _build_session():
+    session = requests.Session()
+    default = PooledAdapter(
+        pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE
+    )
+    session.mount("http://", default)
+    session.mount("https://", default)
+    _adapters["*"] = default
+
+    for host, size in HOST_POOL_SIZES.items():
+        adapter = PooledAdapter(pool_connections=1, pool_maxsize=size)
+        session.mount(f"https://{host}/", adapter)
+        _adapters[host] = adapter
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def _metric_host(host, url):
+    # Long polls wait on purpose, keep them out of Telegram's latency
+    if url.endswith("/getUpdates"):
+        return f"{host}/getUpdates"
+    return host
+
+
+def get_breaker(host):
+    """
+    Returns the breaker of `host`, or None for hosts that have none.
+    """
+    if not host or host in NO_BREAKER_HOSTS:
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def _last_good_key(method, url, kwargs):
+    # Only plain GETs are replayed, and only when the body was read already
+    if method != "GET" or kwargs.get("stream"):
+        return None
+    params = kwargs.get("params") or {}
+    return url, tuple(sorted((str(k), str(v)) for k, v in params.items()))
+
+
+def _remember(key, response):
+    with _last_good_lock:
+        _last_good[key] = (response, time.time())
+        _last_good.move_to_end(key)
+        while len(_last_good) > LAST_GOOD_MAX_ENTRIES:
+            _last_good.popitem(last=False)
+
+
+def _last_good_response(key):
+    with _last_good_lock:
+        entry = _last_good.get(key) if key is not None else None
+    if entry is None:
+        return None
+    response = copy.copy(entry[0])
+    response.from_last_good = True
+    response.last_good_at = entry[1]
+    _replays.count = replay_count() + 1
+    return response
+
+
+def is_replayed(response):
+    """
+    True for a last good response served while the host's breaker is open.
+    """
+    return getattr(response, "from_last_good", False)
+
+
+def replay_count():
+    """
+    How many last good responses this thread was served so far. Compare it
+    before and after a call to tell whether the result is fresh.
+    """
+    return getattr(_replays, "count", 0)
+
+
+def request(method, url, **kwargs):
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    key = _last_good_key(method, url, kwargs)
+    if host in HTTP_HOST_OVERRIDES:
+        url = HTTP_HOST_OVERRIDES[host].rstrip("/") + parts.path
+        if parts.query:
+            url += "?" + parts.query
+    if kwargs.get("timeout") is None and host in HOST_TIMEOUTS:
+        kwargs["timeout"] = HOST_TIMEOUTS[host]
+
+    breaker = get_breaker(host)
+    if breaker is not None and not breaker.allow():
+        response = _last_good_response(key)
+        if response is not None:
+            BREAKER_SHORTCUTS.inc(host, "last_good")
+            return response
+        BREAKER_SHORTCUTS.inc(host, "failed")
+        raise CircuitOpen(f"{host} is failing, not calling it for now")
+
+    with _counts_lock:
+        _request_counts[host] += 1
+    metric_host = _metric_host(host, url)
+    started = time.perf_counter()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        with _counts_lock:
+            _error_counts[host] += 1
+        UPSTREAM_REQUESTS.inc(metric_host, "error")
+        if breaker is not None:
+            breaker.failure()
+        raise
+    UPSTREAM_SECONDS.observe(time.perf_counter() - started, metric_host)
+    UPSTREAM_REQUESTS.inc(metric_host, f"{response.status_code // 100}xx")
+    if breaker is not None:
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.failure()
+        else:
+            breaker.success()
+            if key is not None and response.status_code == 200:
+                _remember(key, response)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def pool_stats():
+    """
+    Returns connection usage per host.
+
+    `connections` is how many connections were opened, `requests` how many
+    requests were sent over them. When keep-alive works, `reused` grows while
+    `connections` stays close to the pool size.
+    """
+    get_session()
+    stats = {}
+    for adapter in _adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host
+            maxsize = getattr(pool.pool, "maxsize", 0)
+            entry = stats.setdefault(
+                host, {"connections": 0, "requests": 0, "reused": 0, "maxsize": maxsize}
+            )
+            entry["connections"] += pool.num_connections
+            entry["requests"] += pool.num_requests
+            entry["reused"] += max(0, pool.num_requests - pool.num_connections)
+
+    with _counts_lock:
+        for host, count in _request_counts.items():
+            entry = stats.setdefault(
+                host, {"connections": 0, "requests": 0, "reused": 0, "maxsize": 0}
+            )
+            entry["calls"] = count
+            entry["errors"] = _error_counts.get(host, 0)
+    return stats
+
+
+def format_pool_stats():
+    lines = []
+    for host, entry in sorted(pool_stats().items()):
+        lines.append(
+            f"{host}: {entry.get('calls', 0)} calls, {entry['connections']} connections opened, "
+            f"{entry['reused']} reused, {entry.get('errors', 0)} errors"
+        )
+    return "\n".join(lines) or "No HTTP requests sent yet."
+
+
+def _breaker_states():
+    values = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    with _breakers_lock:
+        return {(host,): values[b.state] for host, b in _breakers.items()}
+
+
+def _breaker_trips():
+    with _breakers_lock:
+        return {(host,): b.trips for host, b in _breakers.items()}
+
+
+METRICS.gauge_callback(
+    "bot_circuit_state",
+    "Breaker state per upstream host (0 closed, 1 half-open, 2 open)",
+    _breaker_states,
+    ("host",),
+)
+METRICS.counter_callback(
+    "bot_circuit_trips_total", "Times each host's breaker opened", _breaker_trips, ("host",)
+)
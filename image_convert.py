@@ -0,0 +1,99 @@
+"""
+Image conversion, run inside a conversion worker process (see conversion_pool.py).
+
+Only the image header is read before deciding anything: images with more than
+IMAGE_MAX_PIXELS pixels are refused before they are decoded (decompression
+bombs). Big JPEGs are decoded directly at a reduced size with draft(), other
+formats are shrunk with reduce() while resizing, so the full resolution bitmap
+of a huge photo never has to fit in memory. EXIF orientation is applied, modes
+that the target cannot store (RGBA -> JPEG) are converted, and every format is
+saved with tuned encoder settings.
+"""
+
+import io
+import os
+
+from PIL import Image, ImageOps
+
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "4096"))
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "85"))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "7"))
+
+TARGET_FORMATS = ("PNG", "JPEG", "WEBP")
+EXIF_ORIENTATION = 0x0112
+
+# Our own check runs first and gives a clear message, Pillow's is a backstop
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def save_options(output_format):
+    if output_format == "JPEG":
+        return {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}
+    if output_format == "PNG":
+        return {"compress_level": PNG_COMPRESS_LEVEL}
+    if output_format == "WEBP":
+        return {"quality": WEBP_QUALITY, "method": 4}
+    return {}
+
+
+def prepare_mode(image, output_format):
+    """
+    Converts the image to a mode the target format can store.
+    Transparent images are put on a white background for JPEG.
+    """
+    if output_format == "JPEG":
+        if image.mode in ("RGBA", "LA", "PA") or (
+            image.mode == "P" and "transparency" in image.info
+        ):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        if image.mode not in ("RGB", "L"):
+            return image.convert("RGB")
+        return image
+
+    if image.mode in ("CMYK", "YCbCr", "I;16", "F"):
+        return image.convert("RGB")
+    return image
+
+
+# Function to convert an image to a different format
+def convert_image(data, output_format, max_side=IMAGE_MAX_SIDE):
+    """
+    Converts the image in `data` (bytes) and returns the encoded bytes.
+    """
+    output_format = output_format.upper()
+    if output_format not in TARGET_FORMATS:
+        raise ValueError(f"Unsupported target format {output_format}")
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(
+            f"the image has {width * height:,} pixels, the limit is {IMAGE_MAX_PIXELS:,}"
+        )
+
+    # JPEG only: let the decoder scale down by 1/2, 1/4 or 1/8 while decoding.
+    # draft() needs the wanted size with the image's own aspect ratio.
+    if image.format == "JPEG" and max(width, height) > max_side:
+        ratio = max_side / max(width, height)
+        image.draft("RGB", (max(1, int(width * ratio)), max(1, int(height * ratio))))
+
+    # exif_transpose() copies the image even when there is nothing to rotate
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_side:
+        # reducing_gap makes Pillow use reduce() before the final resample
+        image.thumbnail((max_side, max_side), reducing_gap=2.0)
+
+    image = prepare_mode(image, output_format)
+    output = io.BytesIO()
+    image.save(output, format=output_format, **save_options(output_format))
+    return output.getvalue()
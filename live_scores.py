@@ -0,0 +1,216 @@
+"""
+One shared poller for cricapi's currentMatches, used by /livescore.
+
+A background thread fetches the current matches once every LIVESCORE_POLL_SECONDS
+and keeps a snapshot of the live ones, so /livescore is a memory read and any
+number of users cost one upstream request per interval. Chats that sent
+"/livescore subscribe" are told about score changes only: a wicket, a completed
+over, a new innings and the end of a match. The poller only calls the API while
+there are subscribers or someone asked for the score recently.
+"""
+
+import os
+import threading
+import time
+
+import http_client
+
+LIVESCORE_URL = "https://api.cricapi.com/v1/currentMatches"
+LIVESCORE_POLL_SECONDS = int(os.getenv("LIVESCORE_POLL_SECONDS", "60"))
+# Without subscribers, polling stops this long after the last /livescore
+LIVESCORE_IDLE_SECONDS = 600
+
+
+class Innings:
+    __slots__ = ("name", "runs", "wickets", "overs")
+
+    def __init__(self, name, runs, wickets, overs):
+        self.name = name
+        self.runs = runs
+        self.wickets = wickets
+        self.overs = overs
+
+    def __str__(self):
+        return f"{self.runs}/{self.wickets} ({self.overs} overs)"
+
+
+class Match:
+    __slots__ = ("id", "teams", "innings", "status", "started", "ended")
+
+    def __init__(self, data):
+        self.id = data.get("id") or data.get("name")
+        self.teams = [team.get("name", "NA") for team in data.get("teamInfo") or []]
+        self.innings = [
+            Innings(
+                score.get("inning", ""),
+                score.get("r", "NA"),
+                score.get("w", "NA"),
+                score.get("o", "NA"),
+            )
+            for score in data.get("score") or []
+        ]
+        self.status = data.get("status", "")
+        self.started = bool(data.get("matchStarted"))
+        self.ended = bool(data.get("matchEnded"))
+
+    @property
+    def title(self):
+        return " vs ".join(self.teams) if self.teams else "Live Match"
+
+    def format(self):
+        lines = [f"🏏 <b>Live Match:</b> {self.title}\n"]
+        for index, team in enumerate(self.teams[:2]):
+            score = self.innings[index] if index < len(self.innings) else "NA"
+            lines.append(f"🔹 <b>{team}:</b> {score}")
+        lines.append(f"\n📢 <b>Status:</b> {self.status}")
+        return "\n".join(lines)
+
+
+def _completed_overs(overs):
+    try:
+        return int(float(overs))
+    except (TypeError, ValueError):
+        return None
+
+
+def score_changes(old, new):
+    """
+    Returns the messages worth pushing for the difference between two
+    snapshots of the same match.
+    """
+    changes = []
+    for index, innings in enumerate(new.innings):
+        before = old.innings[index] if index < len(old.innings) else None
+        if before is None:
+            if index > 0:
+                changes.append(
+                    f"📢 <b>{new.title}:</b> new innings, {new.innings[index - 1].name} "
+                    f"finished on {new.innings[index - 1]}"
+                )
+            continue
+        if innings.wickets != before.wickets:
+            changes.append(f"☝️ <b>Wicket!</b> {innings.name}: {innings}")
+        elif _completed_overs(innings.overs) != _completed_overs(before.overs):
+            changes.append(f"🔹 <b>{innings.name}:</b> {innings}")
+    if new.ended and not old.ended:
+        changes.append(f"🏁 <b>{new.title}:</b> {new.status}")
+    return changes
+
+
+class LiveScores:
+    def __init__(self, api_key, send_message, poll_seconds=LIVESCORE_POLL_SECONDS):
+        self.api_key = api_key
+        self.send_message = send_message
+        self.poll_seconds = poll_seconds
+        self.matches = {}  # id -> Match, only live matches
+        self.updated_at = None
+        self.error = None
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._wanted_at = 0.0
+        self._refreshed = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fetch(self):
+        response = http_client.get(
+            LIVESCORE_URL, params={"apikey": self.api_key, "offset": 0}
+        )
+        response.raise_for_status()
+        if http_client.is_replayed(response):
+            # Keep the snapshot we have, with its real age
+            raise RuntimeError("cricapi is failing, not called")
+        data = response.json()
+        if data.get("status") != "success" or "data" not in data:
+            raise RuntimeError(data.get("reason") or data.get("status") or "bad response")
+        return {
+            match.id: match
+            for match in map(Match, data["data"])
+            if match.teams
+            and match.started
+            and (not match.ended or match.id in self.matches)
+        }
+
+    def refresh(self):
+        try:
+            current = self.fetch()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Error refreshing live scores: {e}")
+            self._refreshed.set()
+            return
+
+        changes = []
+        with self._lock:
+            previous = self.matches
+            # Compare only with a recent snapshot, not one from before a pause
+            recent = self.updated_at is not None and (
+                time.time() - self.updated_at < 3 * self.poll_seconds
+            )
+            if recent:
+                for match_id, match in current.items():
+                    if match_id in previous:
+                        changes.extend(score_changes(previous[match_id], match))
+            # Ended matches are kept for one round so their result is pushed
+            self.matches = {
+                match_id: match
+                for match_id, match in current.items()
+                if not (match.ended and match_id in previous and previous[match_id].ended)
+            }
+            self.updated_at = time.time()
+            self.error = None
+            subscribers = list(self.subscribers)
+        self._refreshed.set()
+
+        for text in changes:
+            for chat_id in subscribers:
+                self.send_message(chat_id, text)
+
+    def _wanted(self):
+        return self.subscribers or time.time() - self._wanted_at < LIVESCORE_IDLE_SECONDS
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if self._wanted():
+                self.refresh()
+            self._wake.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="livescore-poller", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def snapshot(self, wait=5):
+        """
+        Returns (live matches, updated_at). Wakes the poller when it was idle
+        and waits up to `wait` seconds for it to refresh.
+        """
+        idle = not self._wanted()
+        self._wanted_at = time.time()
+        if idle:
+            # The snapshot is from before the pause, wait for a fresh one
+            self._refreshed.clear()
+        if not self._refreshed.is_set():
+            self._wake.set()
+            self._refreshed.wait(wait)
+        with self._lock:
+            live = [match for match in self.matches.values() if not match.ended]
+            return live, self.updated_at
+
+    def subscribe(self, chat_id):
+        with self._lock:
+            self.subscribers.add(chat_id)
+        self._wake.set()
+
+    def unsubscribe(self, chat_id):
+        with self._lock:
+            self.subscribers.discard(chat_id)
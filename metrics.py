@@ -0,0 +1,195 @@
+"""
+Counters, latency histograms and gauges for the whole bot.
+
+Modules record into the shared METRICS registry: the router counts every
+update per command and times the handler, http_client times every upstream
+call, webhook.py counts what happened to each webhook request. Values that
+already live elsewhere (queue depths, cache counters, send results) are read
+through callbacks when the metrics are rendered, so they cost nothing until
+then. render() produces the Prometheus text format served on /metrics.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_value(value):
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for label_values, value in sorted(self.values().items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def series(self):
+        with self._lock:
+            return {labels: list(values) for labels, values in self._series.items()}
+
+    def quantile(self, q, *label_values):
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+        Returns None without observations, inf when it is above every bucket.
+        """
+        with self._lock:
+            series = self._series.get(label_values)
+            series = list(series) if series else None
+        if not series or not series[-2]:
+            return None
+        rank = q * series[-2]
+        seen = 0
+        for bound, count in zip(self.buckets, series):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        for label_values, series in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            yield f"{self.name}_bucket", labels, series[-2]
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_count", labels, series[-2]
+            yield f"{self.name}_sum", labels, series[-1]
+
+
+class Callback:
+    """
+    A gauge or counter whose values come from `read()` at render time.
+    `read` returns a number, or a dict {label values tuple: number}.
+    """
+
+    def __init__(self, kind, name, help_text, read, labels=()):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.labels = labels
+
+    def values(self):
+        try:
+            values = self.read()
+        except Exception as e:
+            print(f"Error reading metric {self.name}: {e}")
+            return {}
+        if isinstance(values, dict):
+            return values
+        return {(): values}
+
+    def samples(self):
+        for label_values, value in sorted(self.values().items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # Registering the same name again returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def gauge_callback(self, name, help_text, read, labels=()):
+        with self._lock:
+            self._metrics[name] = Callback("gauge", name, help_text, read, labels)
+
+    def counter_callback(self, name, help_text, read, labels=()):
+        with self._lock:
+            self._metrics[name] = Callback("counter", name, help_text, read, labels)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+_started_at = time.time()
+METRICS.gauge_callback(
+    "bot_start_time_seconds", "Unix time the bot was started", lambda: _started_at
+)
@@ -0,0 +1,156 @@
+"""
+Headlines for /news, kept in memory and refreshed in the background.
+
+Every (country, category) pair that was asked for is a topic. A scheduler
+thread fetches the headlines of each topic once every NEWS_REFRESH_SECONDS, so
+/news only reads memory. When newsapi.org is down or rate limited the last good
+headlines stay in place and are served with their age. Topics nobody asked for
+in NEWS_TOPIC_IDLE_SECONDS are no longer refreshed (the default one always is);
+a request for such a topic gets the old headlines and wakes the scheduler.
+"""
+
+import os
+import threading
+import time
+
+import http_client
+
+NEWS_REFRESH_SECONDS = int(os.getenv("NEWS_REFRESH_SECONDS", "1800"))
+NEWS_TOPIC_IDLE_SECONDS = 6 * 3600
+NEWS_MAX_TOPICS = 50
+NEWS_PAGE_SIZE = 5
+
+CATEGORIES = (
+    "business",
+    "entertainment",
+    "general",
+    "health",
+    "science",
+    "sports",
+    "technology",
+)
+DEFAULT_TOPIC = ("us", "general")
+
+
+class Topic:
+    __slots__ = ("headlines", "fetched_at", "attempted_at", "wanted_at", "error", "loaded")
+
+    def __init__(self):
+        self.headlines = None  # List of (title, source) from the last good fetch
+        self.fetched_at = None
+        self.attempted_at = 0.0
+        self.wanted_at = time.time()
+        self.error = None
+        self.loaded = threading.Event()  # Set after the first attempt
+
+
+class NewsDigest:
+    def __init__(self, api_key, url, refresh_seconds=NEWS_REFRESH_SECONDS):
+        self.api_key = api_key
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.topics = {DEFAULT_TOPIC: Topic()}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fetch(self, country, category):
+        response = http_client.get(
+            self.url,
+            params={"country": country, "category": category, "pageSize": NEWS_PAGE_SIZE},
+            headers={"X-Api-Key": self.api_key or ""},
+        )
+        if http_client.is_replayed(response):
+            # Keep the headlines we have, with their real age
+            raise RuntimeError("newsapi.org is failing, not called")
+        data = response.json()
+        if response.status_code != 200 or data.get("status") != "ok":
+            raise RuntimeError(data.get("code") or f"HTTP {response.status_code}")
+        return [
+            (article.get("title") or "", (article.get("source") or {}).get("name") or "")
+            for article in data.get("articles", [])
+        ]
+
+    def refresh(self, key, topic):
+        topic.attempted_at = time.time()
+        try:
+            headlines = self.fetch(*key)
+        except Exception as e:
+            # Keep the last good headlines
+            topic.error = str(e)
+            print(f"Error refreshing news {key}: {e}")
+        else:
+            topic.headlines = headlines
+            topic.fetched_at = time.time()
+            topic.error = None
+        topic.loaded.set()
+
+    def _due(self, now):
+        with self._lock:
+            # The Topic objects, not keys: _topic() may forget a key meanwhile
+            return [
+                (key, topic)
+                for key, topic in self.topics.items()
+                if now - topic.attempted_at >= self.refresh_seconds
+                and (key == DEFAULT_TOPIC or now - topic.wanted_at < NEWS_TOPIC_IDLE_SECONDS)
+            ]
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                for key, topic in self._due(time.time()):
+                    self.refresh(key, topic)
+            except Exception as e:
+                print(f"Error in the news scheduler: {e}")
+            self._wake.wait(60)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="news-refresh", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _topic(self, key):
+        with self._lock:
+            topic = self.topics.get(key)
+            if topic is None:
+                if len(self.topics) >= NEWS_MAX_TOPICS:
+                    # Forget the topic asked for least recently
+                    oldest = min(
+                        (k for k in self.topics if k != DEFAULT_TOPIC),
+                        key=lambda k: self.topics[k].wanted_at,
+                    )
+                    del self.topics[oldest]
+                topic = self.topics[key] = Topic()
+            return topic
+
+    def read(self, country="us", category="general", wait=5):
+        """
+        Returns the Topic for a country and category. A topic that was never
+        fetched makes the scheduler fetch it, waiting up to `wait` seconds.
+        """
+        key = (country, category)
+        topic = self._topic(key)
+        now = time.time()
+        idle = now - topic.wanted_at >= NEWS_TOPIC_IDLE_SECONDS
+        topic.wanted_at = now
+        if idle or not topic.loaded.is_set():
+            self._wake.set()
+            topic.loaded.wait(wait)
+        return topic
+
+    def headlines(self, country="us", category="general", wait=5):
+        """
+        read() as (headlines, fetched_at, error), plain values that can be
+        sent to a worker process (see shared_services.py).
+        """
+        topic = self.read(country, category, wait)
+        return topic.headlines, topic.fetched_at, topic.error
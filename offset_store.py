@@ -0,0 +1,70 @@
+"""
+Keeps the getUpdates offset on disk so a restarted bot continues where it stopped.
+
+The saved offset is the first update that has not been handled yet, so a
+restart never skips ahead of unanswered updates that Telegram still holds.
+It cannot bring back more than that: Telegram forgets every update below the
+offset of the last getUpdates call, and UpdateEngine asks for the next batch
+while the previous one is still running. Updates that were running when the
+bot crashed are usually gone. Only a batch that no later getUpdates confirmed
+is delivered again, including the updates of it that were already answered.
+Writes go to a temporary file that replaces the old one (os.replace), a crash
+can never leave a half written file.
+"""
+
+import os
+import threading
+import time
+
+OFFSET_FILE = os.getenv("OFFSET_FILE", ".bot_offset")
+# Write at most once per this many seconds, 0 writes after every handled update
+OFFSET_FLUSH_SECONDS = float(os.getenv("OFFSET_FLUSH_SECONDS", "1"))
+
+
+class OffsetStore:
+    def __init__(self, path=OFFSET_FILE, flush_seconds=OFFSET_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.offset = None
+        self._saved = None
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.offset = int(f.read().strip())
+        except FileNotFoundError:
+            self.offset = None
+        except ValueError:
+            print(f"Ignoring unreadable offset file {self.path}")
+            self.offset = None
+        self._saved = self.offset
+        return self.offset
+
+    def update(self, offset):
+        """
+        Records the new offset and writes it when the last write is old enough.
+        """
+        with self._lock:
+            if self.offset is not None and offset <= self.offset:
+                return
+            self.offset = offset
+            if time.monotonic() - self._saved_at >= self.flush_seconds:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        if self.offset is None or self.offset == self._saved:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(self.offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._saved = self.offset
+        self._saved_at = time.monotonic()
@@ -0,0 +1,163 @@
+"""
+Streaming text extraction for uploaded PDFs.
+
+Pages are extracted one at a time and handed on right away: the first message
+goes out as soon as 4096 characters are ready instead of after the whole file
+was parsed. Long results are written to a spooled temporary file (in memory
+while small, on disk after that) and uploaded as a .txt document, so memory
+stays flat no matter how big the PDF is.
+"""
+
+import io
+import os
+import tempfile
+
+# Telegram rejects messages longer than 4096 characters
+MESSAGE_LIMIT = 4096
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "2000000"))
+# Above this many messages the text is sent as a .txt document instead
+PDF_MAX_MESSAGES = int(os.getenv("PDF_MAX_MESSAGES", "3"))
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+class PdfTextStream:
+    """
+    Iterates over the text of a PDF page by page, within a page and character budget.
+    `truncated` tells whether the budget cuts the text short, it is already
+    correct when the last page is yielded.
+    """
+
+    def __init__(self, file, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+        # Imported here: only the conversion workers parse PDFs, the bot
+        # process uses deliver_pdf_text() and never needs PyPDF2
+        from PyPDF2 import PdfReader
+
+        self.reader = PdfReader(file)
+        self.total_pages = len(self.reader.pages)
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.pages_read = 0
+        self.chars_read = 0
+        self.truncated = False
+
+    def __iter__(self):
+        for page in self.reader.pages:
+            if self.pages_read >= self.max_pages or self.chars_read >= self.max_chars:
+                return
+            text = page.extract_text() or ""
+            if self.chars_read + len(text) > self.max_chars:
+                text = text[: self.max_chars - self.chars_read]
+                self.truncated = True
+            self.pages_read += 1
+            self.chars_read += len(text)
+            if self.pages_read < self.total_pages and (
+                self.pages_read >= self.max_pages or self.chars_read >= self.max_chars
+            ):
+                self.truncated = True
+            # Start every page on a new line
+            yield text if text.endswith("\n") else text + "\n"
+
+
+def pdf_pages(data, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+    """
+    Yields (text, pages_read, total_pages, truncated) for every page of the
+    PDF in `data` (bytes). Runs in a conversion worker process.
+    """
+    stream = PdfTextStream(io.BytesIO(data), max_pages, max_chars)
+    for text in stream:
+        yield text, stream.pages_read, stream.total_pages, stream.truncated
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """
+    Splits text into pieces of at most `limit` characters, preferring to
+    break at a newline, then at a space.
+    """
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        yield text[:cut]
+        text = text[cut:].lstrip("\n")
+    if text:
+        yield text
+
+
+class MessageChunker:
+    """
+    Collects page texts and hands out message sized chunks as soon as they are full.
+    """
+
+    def __init__(self, limit=MESSAGE_LIMIT):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    def feed(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size <= self.limit:
+            return []
+        pieces = list(split_text("".join(self.parts), self.limit))
+        # The last piece may still grow with the next page
+        rest = pieces.pop()
+        self.parts = [rest]
+        self.size = len(rest)
+        return pieces
+
+    def flush(self):
+        text = "".join(self.parts).strip()
+        self.parts = []
+        self.size = 0
+        return list(split_text(text, self.limit)) if text else []
+
+
+def deliver_pdf_text(pages, send_text, send_file, max_messages=PDF_MAX_MESSAGES):
+    """
+    Delivers the page texts coming from pdf_pages() with the given callbacks.
+
+    send_text(text) is called for every message sized chunk while at most
+    `max_messages` are needed. When the text is longer, the full text is passed
+    to send_file(spooled_file, caption) as a .txt document instead, it has to
+    finish the upload before returning because the file is closed afterwards.
+    """
+    chunker = MessageChunker()
+    sent = 0
+    skipped = False  # Text of a page that was not fed to the chunker
+    pages_read = total_pages = 0
+    truncated = False
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    with spool as full_text:
+        for page_text, pages_read, total_pages, truncated in pages:
+            full_text.write(page_text.encode("utf-8"))
+            if sent < max_messages:
+                for chunk in chunker.feed(page_text):
+                    if sent < max_messages:
+                        send_text(chunk)
+                    sent += 1
+            elif page_text.strip():
+                skipped = True
+
+        rest = chunker.flush()
+        if not skipped and sent + len(rest) <= max_messages:
+            if sent == 0 and not rest:
+                send_text("❌ No text found in this PDF.")
+            for chunk in rest:
+                send_text(chunk)
+            if truncated:
+                send_text(f"✂️ Stopped after {pages_read} of {total_pages} pages.")
+            return
+
+        caption = f"📄 Full text of {pages_read} of {total_pages} pages"
+        full_text.seek(0)
+        send_file(full_text, caption)
+
+
+def convert_pdf_to_text(file_path):
+    """
+    Returns the whole text at once, for callers that need a single string.
+    """
+    return "".join(PdfTextStream(file_path))
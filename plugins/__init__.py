@@ -0,0 +1,69 @@
+"""
+Commands that are only imported when they are first used.
+
+Every module of this package registers its commands with @ROUTER.command like
+handlers.py does, but it is not imported at start: ROUTER.plugin() below only
+records which commands it provides. The first /weather imports
+plugins/weather.py (and country_index, its API key check, ...), the first
+uploaded file imports plugins/files.py. So a restart, or a new worker process
+(see supervisor.py), reaches its first getUpdates sooner.
+
+PLUGINS_PREWARM ("files,weather" or "all") imports chosen plugins in the
+background right after the start, so their first use does not wait for the import.
+
+To add a plugin, create plugins/<name>.py and declare its commands here.
+"""
+
+import os
+import threading
+
+from commands import ROUTER
+
+PLUGINS_PREWARM = os.getenv("PLUGINS_PREWARM", "")
+
+# Plugin name -> commands it registers
+PLUGINS = {
+    "devian": ("/devian",),
+    "github": ("/github",),
+    "cricket": ("/livescore", "/iplstats"),
+    "news": ("/news",),
+    "weather": ("/weather",),
+    "movies": ("/movie",),
+    "recipe": ("/recipe",),
+    "export": ("/export",),
+    "files": (),  # The handler of uploaded documents
+}
+
+for _name, _commands in PLUGINS.items():
+    ROUTER.plugin(f"plugins.{_name}", *_commands, document=_name == "files")
+
+
+def prewarm_names(setting=PLUGINS_PREWARM):
+    names = [name.strip() for name in setting.split(",") if name.strip()]
+    if names == ["all"]:
+        return list(PLUGINS)
+    for name in names:
+        if name not in PLUGINS:
+            print(f"Unknown plugin in PLUGINS_PREWARM: {name}")
+    return [name for name in names if name in PLUGINS]
+
+
+def prewarm(names=None):
+    """
+    Imports the plugins in `names` (default PLUGINS_PREWARM) on a background
+    thread. Returns the thread, or None when there is nothing to import.
+    """
+    names = prewarm_names() if names is None else names
+    if not names:
+        return None
+
+    def load():
+        for name in names:
+            try:
+                ROUTER.load_plugin(f"plugins.{name}")
+            except Exception as e:
+                print(f"Could not load plugin {name}: {e}")
+
+    thread = threading.Thread(target=load, name="plugin-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,85 @@
+"""
+/livescore and /iplstats: live scores from the shared poller in live_scores.py
+and player statistics from cricapi.
+"""
+
+import time
+
+import requests
+
+import http_client
+import shared_services
+from commands import ROUTER
+from config import CACHE_TTL, check_keys
+from response_cache import cached, is_ok_reply
+
+check_keys("CRIC_KEY")
+# Shared currentMatches poller behind /livescore, pushes changes to subscribers.
+# One for the whole bot, also with worker processes
+LIVE_SCORES = shared_services.get("live_scores")
+
+
+@cached("cricapi_players", *CACHE_TTL["cricapi_players"], cache_if=is_ok_reply)
+def get_kkr_player_stats(player_name):
+    player_name = player_name.lower().replace(" ", "-")
+    url = f"https://api.cricapi.com/v1/players?name={player_name}&apikey=YOUR_API_KEY"
+
+    try:
+        response = http_client.get(url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching player stats: {e}")
+        return "❌ Unable to fetch player statistics. Try again later!"
+    if response.status_code == 200:
+        data = response.json()
+        if "data" in data and len(data["data"]) > 0:
+            player = data["data"][0]
+            return (
+                f"📊 <b>Player Stats for {player['name']}</b>\n\n"
+                f"🏏 <b>Matches Played:</b> {player.get('matches', 'N/A')}\n"
+                f"⚡ <b>Runs Scored:</b> {player.get('runs', 'N/A')}\n"
+                f"🎯 <b>Wickets Taken:</b> {player.get('wickets', 'N/A')}\n"
+                f"🔗 <a href='{player.get('profile', '#')}'>More Details</a>"
+            )
+        else:
+            return "❌ Player not found in KKR database."
+    return "❌ Unable to fetch player statistics. Try again later!"
+
+
+# Function to get live cricket scores
+def get_live_score():
+    """
+    Formats every live match from the shared poller's snapshot.
+    """
+    matches, updated_at = LIVE_SCORES.snapshot()
+    if updated_at is None:
+        return "❌ Unable to connect to live score API!"
+    if not matches:
+        return "⚠ No live matches currently. Check back later!"
+    age = int(time.time() - updated_at)
+    return "\n\n".join(match.format() for match in matches) + f"\n\n<i>Updated {age}s ago</i>"
+
+
+@ROUTER.command("/iplstats")
+def iplstats_command(ctx):
+    if not ctx.args:
+        ctx.reply("ℹ️ Usage: <code>/iplstats &lt;player_name&gt;</code>")
+        return
+    ctx.reply(get_kkr_player_stats(ctx.args))
+
+
+@ROUTER.command("/livescore")
+def livescore_command(ctx):
+    """
+    Usage: /livescore, or /livescore subscribe|unsubscribe for score changes
+    """
+    if ctx.args == "subscribe":
+        LIVE_SCORES.subscribe(ctx.chat_id)
+        ctx.reply(
+            "✅ Subscribed! You'll get wickets, overs and results of live matches.\n"
+            "Send <code>/livescore unsubscribe</code> to stop."
+        )
+    elif ctx.args == "unsubscribe":
+        LIVE_SCORES.unsubscribe(ctx.chat_id)
+        ctx.reply("🔕 Unsubscribed from live score updates.")
+    else:
+        ctx.reply(get_live_score())
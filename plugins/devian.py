@@ -0,0 +1,63 @@
+"""
+/devian: contributor details from contributors.txt, indexed in memory by roster.py.
+"""
+
+from commands import ROUTER
+from roster import Roster
+
+# Roll number index of contributors.txt, refreshed in the background
+ROSTER = Roster().start()
+# How long the first /devian after a start may wait for the roster to load
+ROSTER_WAIT_SECONDS = 5
+
+
+def format_devian(line):
+    return (
+        line.replace(",", "\n")
+        .replace("Name:", "📝 Name:")
+        .replace("Roll:", "🎓 Roll:")
+        .replace("Branch:", "🏛 Branch:")
+        .replace("Section:", "📚 Section:")
+        .replace("Email:", "📩 Email:")
+    )
+
+
+def get_devians_details(roll_no):
+    """
+    Fetches student details from contributors.txt on GitHub using roll number.
+    Several roll numbers can be given at once, separated by spaces or commas.
+    The roster is kept indexed in memory by roster.py, so this does not download anything.
+    """
+    ROSTER.start()
+    if not ROSTER.wait_until_loaded(ROSTER_WAIT_SECONDS):
+        return "❌ Unable to fetch devians data. Try again later!"
+
+    roll_nos = list(dict.fromkeys(roll_no.replace(",", " ").split()))
+    found = []
+    missing = []
+    for roll, line in ROSTER.lookup_many(roll_nos):
+        if line:
+            found.append(format_devian(line))
+        else:
+            missing.append(roll)
+
+    if not found:
+        return "❌ Devians not found!"
+
+    reply = "📌 <b>Devians Details:</b>\n" + "\n\n".join(found)
+    if missing:
+        reply += f"\n\n❌ Devians not found: {', '.join(missing)}"
+    return reply
+
+
+@ROUTER.command("/devian")
+def devian_command(ctx):
+    """
+    Fetches student details from contributors.txt on GitHub using roll number.
+    use = /devian <roll_no> [roll_no ...] - Get Devians details using roll numbers
+    """
+    if not ctx.args:
+        ctx.reply("ℹ️ Usage: <code>/devian &lt;roll_no&gt; [roll_no ...]</code>")
+        return
+    devians_info = get_devians_details(ctx.args)
+    ctx.reply(devians_info)
@@ -0,0 +1,45 @@
+"""
+/export: downloads the chat's history as JSON Lines or CSV (see chat_export.py).
+"""
+
+from chat_export import export_parts, parse_export_args
+from chat_history import HISTORY
+from commands import ROUTER
+from telegram_api import send_document, send_message
+
+
+def export_chat(chat_id, file_format, compress=False, since=None, until=None):
+    """
+    Sends the chat's history as one or more documents. Each part is uploaded
+    before the next one is written, so at most one part exists at a time.
+    """
+    rows = HISTORY.messages(chat_id, since, until)
+    sent = 0
+    for part in export_parts(rows, file_format, f"chat_history_{chat_id}", compress):
+        try:
+            # Only split exports get a caption, telling what each part holds
+            caption = f"{part.rows} messages" if "_part" in part.filename else None
+            send_document(chat_id, part.body, part.filename, None, caption=caption).result()
+        finally:
+            part.close()
+        sent += 1
+
+    if not sent:
+        send_message(chat_id, "No chat history available.")
+
+
+@ROUTER.command("/export")
+def export_command(ctx):
+    """
+    Sends the chat history as a downloadable file.
+    Usage: /export [json|csv] [gz] [from YYYY-MM-DD [to YYYY-MM-DD]]
+    json gives JSON Lines, gz compresses the file, dates limit the range (UTC).
+    """
+    try:
+        file_format, compress, since, until = parse_export_args(ctx.arg_list)
+    except ValueError:
+        ctx.reply(
+            "ℹ️ Usage: <code>/export [json|csv] [gz] [from YYYY-MM-DD] [to YYYY-MM-DD]</code>"
+        )
+        return
+    export_chat(ctx.chat_id, file_format, compress, since, until)
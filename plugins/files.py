@@ -0,0 +1,99 @@
+"""
+Uploaded images and PDFs: converted in the worker processes of conversion_pool.py.
+"""
+
+import io
+
+from commands import ROUTER
+from config import MAX_DOWNLOAD_BYTES
+from conversion_cache import CONVERSIONS, ReplyRecorder, replay
+from conversion_pool import POOL, JobFailed, PoolBusy
+from pdf_text import deliver_pdf_text
+from telegram_api import FileTooLarge, download_file, get_file
+
+IMAGE_TARGETS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "webp": "WEBP"}
+
+TOO_LARGE_MESSAGE = (
+    f"❌ This file is too big. The limit is {MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB."
+)
+
+
+def conversion_target(document, caption=""):
+    """
+    Returns what an uploaded file is converted to, or None when it is not supported.
+    Images can be sent with the caption png, jpeg or webp to pick the format,
+    otherwise JPEG becomes PNG and everything else becomes JPEG.
+    """
+    mime_type = document.get("mime_type", "")
+    if mime_type.startswith("image/"):
+        wanted = IMAGE_TARGETS.get(caption.strip().lower())
+        if wanted:
+            return wanted
+        return "PNG" if mime_type == "image/jpeg" else "JPEG"
+    if mime_type == "application/pdf":
+        return "text"
+    return None
+
+
+def send_pdf_text(replies, data):
+    """
+    Sends the text of a PDF as plain messages while it is extracted, or as a
+    .txt document when it is too long for a few messages (see pdf_text.py).
+    The extraction itself runs in a conversion worker process.
+    """
+    deliver_pdf_text(
+        POOL.stream("pdf_text:pdf_pages", data),
+        replies.text,
+        # The spooled file is closed after this returns, so wait for the upload
+        lambda full_text, caption: replies.document(
+            full_text, "pdf_text.txt", caption=caption
+        ).result(),
+    )
+
+
+@ROUTER.on_document
+def document_handler(ctx):
+    document = ctx.document
+    target = conversion_target(document, ctx.message.get("caption", ""))
+    if target is None:
+        ctx.reply("Unsupported file type.")
+        return
+
+    # The same file was converted before: send the earlier result again
+    cached_replies = CONVERSIONS.get(document.get("file_unique_id"), target)
+    if cached_replies:
+        replay(ctx, cached_replies)
+        return
+
+    if document.get("file_size", 0) > MAX_DOWNLOAD_BYTES:
+        ctx.reply(TOO_LARGE_MESSAGE)
+        return
+
+    replies = ReplyRecorder(ctx)
+    try:
+        file_info = get_file(document["file_id"])
+        with download_file(file_info["result"]["file_path"]) as buffer:
+            file_content = buffer.read()
+
+        if target == "text":
+            send_pdf_text(replies, file_content)
+        else:
+            converted_image = POOL.run(
+                "image_convert:convert_image", file_content, target
+            )
+            replies.document(
+                io.BytesIO(converted_image), f"converted_image.{target.lower()}"
+            )
+    except FileTooLarge:
+        ctx.reply(TOO_LARGE_MESSAGE)
+        return
+    except PoolBusy:
+        ctx.reply(
+            "⏳ Too many files are being converted right now. Please try again in a minute."
+        )
+        return
+    except JobFailed as e:
+        ctx.reply(f"❌ Could not convert this file: {e}")
+        return
+
+    replies.save_when_sent(CONVERSIONS, document.get("file_unique_id"), target)
@@ -0,0 +1,146 @@
+"""
+/github: GitHub users and repositories, several per command (see github_batch.py).
+"""
+
+import html
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from commands import ROUTER
+from config import CACHE_TTL, GITHUB_TOKEN
+from github_batch import GITHUB_MAX_TARGETS, fetch_batch, parse_targets
+from response_cache import CACHE, cached, is_ok_reply, normalize
+
+# REST lookups of a multi-target /github run side by side on these threads
+GITHUB_REST = ThreadPoolExecutor(max_workers=4, thread_name_prefix="github")
+GITHUB_HEADERS = {"Authorization": f"bearer {GITHUB_TOKEN}"} if GITHUB_TOKEN else None
+
+
+@cached(
+    "github",
+    *CACHE_TTL["github"],
+    key=lambda username: ("user", username),
+    cache_if=is_ok_reply,
+)
+def get_github_profile(username):
+    """
+    Gets GitHub user details like profile link, public repos,
+    and followers.Converts username to lowercase to avoid errors.
+    use = /github <username> - Get GitHub user details (profile, repos, followers)
+    """
+    username = username.lower()
+    url = f"https://api.github.com/users/{username}"
+    response = http_client.get(url, headers=GITHUB_HEADERS)
+    if response.status_code == 200:
+        return format_github_profile(response.json())
+    else:
+        return format_github_profile(None)
+
+
+@cached(
+    "github",
+    *CACHE_TTL["github"],
+    key=lambda repo_path: ("repo", repo_path),
+    cache_if=is_ok_reply,
+)
+def get_github_repo(repo_path):
+    """
+    Gets GitHub repo details like stars, forks, and last updated date.
+    Converts repo path to lowercase to avoid errors.
+    use = /github repo <owner/repo> - Get GitHub repository details (stars, forks, last update)
+    """
+    repo_path = repo_path.lower()
+    url = f"https://api.github.com/repos/{repo_path}"
+    response = http_client.get(url, headers=GITHUB_HEADERS)
+    if response.status_code == 200:
+        return format_github_repo(response.json())
+    else:
+        return format_github_repo(None)
+
+
+def get_github_many(targets):
+    """
+    Replies for several ("user", name) / ("repo", "owner/repo") targets, in order.
+    With a GITHUB_TOKEN the ones not in the cache are fetched with one GraphQL
+    query; without one, or when that query fails, the REST lookups run side by side.
+    """
+    replies = {}
+    if GITHUB_TOKEN:
+        keys = {target: ("github",) + normalize(target) for target in targets}
+        missing = []
+        for target in targets:
+            replies[target] = CACHE.get(keys[target])
+            if replies[target] is None:
+                missing.append(target)
+        if missing:
+            try:
+                results = fetch_batch(missing, GITHUB_TOKEN)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"GitHub GraphQL lookup failed, using REST: {e}")
+            else:
+                for target, data in results.items():
+                    format_reply = format_github_profile if target[0] == "user" else format_github_repo
+                    replies[target] = format_reply(data)
+                    if data is not None:
+                        CACHE.put(keys[target], replies[target], *CACHE_TTL["github"])
+
+    lookups = {
+        target: GITHUB_REST.submit(
+            get_github_profile if target[0] == "user" else get_github_repo, target[1]
+        )
+        for target in targets
+        if replies.get(target) is None
+    }
+    for target, lookup in lookups.items():
+        try:
+            replies[target] = lookup.result()
+        except requests.exceptions.RequestException as e:
+            print(f"GitHub lookup of {target[1]} failed: {e}")
+            replies[target] = f"❌ Could not reach GitHub for {html.escape(target[1])}."
+    return "\n\n".join(replies[target] for target in targets)
+
+
+def format_github_profile(data):
+    if data is None:
+        return "❌ GitHub user not found."
+    return (
+        f"🏷 <b>GitHub Profile:</b> {data['login']}\n"
+        f"🔗 <a href=\"{data['html_url']}\">Profile Link</a>\n"
+        f"🏆 <b>Public Repos:</b> {data['public_repos']}\n"
+        f"👥 <b>Followers:</b> {data['followers']}"
+    )
+
+
+def format_github_repo(data):
+    if data is None:
+        return "❌ Repository not found."
+    return (
+        f"📌 <b>Repository:</b> {data['name']}\n"
+        f"🔗 <a href=\"{data['html_url']}\">Repo Link</a>\n"
+        f"⭐ <b>Stars:</b> {data['stargazers_count']}\n"
+        f"🍴 <b>Forks:</b> {data['forks_count']}\n"
+        f"📅 <b>Last Updated:</b> {data['updated_at'][:10]}"
+    )
+
+
+@ROUTER.command("/github")
+def github_command(ctx):
+    """
+    Gets GitHub user details like profile link, public repos, and followers.
+    Converts username to lowercase to avoid errors.
+    Several usernames and owner/repo paths can be given at once.
+    """
+    usage = "ℹ️ Usage: `/github <username>` or `/github repo <username>/<repo>` (several can be listed)"
+    try:
+        targets = parse_targets(ctx.arg_list)
+    except ValueError:
+        targets = []
+    if not targets:
+        response = usage
+    elif len(targets) > GITHUB_MAX_TARGETS:
+        response = f"❌ Up to {GITHUB_MAX_TARGETS} users or repositories at once."
+    else:
+        response = get_github_many(targets)
+    ctx.reply(response)
@@ -0,0 +1,53 @@
+"""
+/movie: movie details from OMDB.
+"""
+
+import requests
+
+import http_client
+from commands import ROUTER
+from config import CACHE_TTL, OMDB_KEY, check_keys
+from response_cache import cached, is_ok_reply
+
+check_keys("OMDB_KEY")
+
+
+@cached("omdb", *CACHE_TTL["omdb"], cache_if=is_ok_reply)
+def get_movie_details(movie_name):
+    """
+    Fetches movie details from the OMDB API.
+    """
+    url = f"http://www.omdbapi.com/?t={movie_name}&apikey={OMDB_KEY}"
+
+    try:
+        response = http_client.get(url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching movie details: {e}")
+        return "❌ Unable to fetch movie details at the moment."
+    if response.status_code == 200:
+        data = response.json()
+        if data["Response"] == "True":
+            movie_info = (
+                f"🎬 <b>{data['Title']}</b> ({data['Year']})\n"
+                f"📽 <b>Genre:</b> {data['Genre']}\n"
+                f"🎭 <b>Actors:</b> {data['Actors']}\n"
+                f"📊 <b>IMDB Rating:</b> {data['imdbRating']}\n"
+                f"📝 <b>Plot:</b> {data['Plot']}"
+            )
+            return movie_info
+        else:
+            return "❌ Movie not found! Please check the name and try again."
+    return "❌ Unable to fetch movie details at the moment."
+
+
+@ROUTER.command("/movie")
+def movie_command(ctx):
+    """
+    Fetches movie details from OMDB API using the given movie name.
+    Usage: /movie <movie_name>
+    """
+    if not ctx.args:
+        ctx.reply("ℹ️ Usage: <code>/movie &lt;movie_name&gt;</code>")
+        return
+    movie_details = get_movie_details(ctx.args)
+    ctx.reply(movie_details)
@@ -0,0 +1,68 @@
+"""
+/news: headlines per country and category from the digest in news_digest.py.
+"""
+
+import html
+import time
+
+import shared_services
+from commands import ROUTER
+from config import check_keys
+from country_index import lookup_country
+from news_digest import CATEGORIES as NEWS_CATEGORIES
+
+check_keys("NEWS_API_KEY")
+# Headlines per country and category, refreshed in the background. One
+# NewsDigest for the whole bot, also with worker processes
+NEWS = shared_services.get("news")
+
+
+def get_news(country="us", category="general"):
+    """
+    Formats the headlines of a country and category from the NEWS digest.
+    """
+    headlines, fetched_at, error = NEWS.headlines(country, category)
+    if not headlines:
+        if fetched_at is None and error is None:
+            return "❌ The news is still loading, please try again in a moment."
+        if fetched_at is None:
+            return "❌ Unable to fetch the news right now!"
+        return "⚠ No headlines found for this country and category."
+
+    lines = [f"📰 <b>Top {category} headlines ({country.upper()})</b>\n"]
+    lines += [
+        f"{html.escape(title)} - {html.escape(source)}"
+        for title, source in headlines
+    ]
+    minutes = int(time.time() - fetched_at) // 60
+    age = f"{minutes} min ago" if minutes else "just now"
+    if error:
+        age += ", the news service is unavailable at the moment"
+    lines.append(f"\n<i>Updated {age}</i>")
+    return "\n".join(lines)
+
+
+@ROUTER.command("/news")
+def news_command(ctx):
+    """
+    Usage: /news [category] [country], e.g. /news sports india
+    """
+    category = "general"
+    country_words = []
+    for word in ctx.arg_list:
+        if word in NEWS_CATEGORIES:
+            category = word
+        else:
+            country_words.append(word)
+
+    country = "us"
+    if country_words:
+        code = lookup_country(" ".join(country_words))
+        if code is None:
+            ctx.reply(
+                "ℹ️ Usage: <code>/news [category] [country]</code>\n"
+                f"Categories: {', '.join(NEWS_CATEGORIES)}"
+            )
+            return
+        country = code.lower()
+    ctx.reply(get_news(country, category))
@@ -0,0 +1,66 @@
+"""
+/recipe: a random recipe from TheMealDB.
+"""
+
+import requests
+
+import http_client
+from commands import ROUTER
+from telegram_api import send_message
+
+
+def veg():
+    base_url = "https://www.themealdb.com/api/json/v1/1/random.php"  # No API key needed for this free API
+    try:
+        response = http_client.get(base_url)
+        response.raise_for_status()
+        data = response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching recipe: {e}")
+        return None
+
+    if data and data["meals"]:  # TheMealDB returns 'meals' array
+        meal = data["meals"][0]
+        recipe = {
+            "title": meal["strMeal"],
+            "ingredients": [],
+            "instructions": meal["strInstructions"],
+            "sourceUrl": meal["strSource"],
+            "image": meal["strMealThumb"],
+        }
+
+        for i in range(1, 21):
+            ingredient = meal[f"strIngredient{i}"]
+            measure = meal[f"strMeasure{i}"]
+            if ingredient and ingredient.strip():
+                recipe["ingredients"].append(
+                    f"- {measure} {ingredient}"
+                )  # Added bullet point for ingredient list
+
+        return recipe
+    else:
+        return None
+
+
+@ROUTER.command("/recipe")
+def recipe_command(ctx):
+    recipe_data = veg()
+    if recipe_data:
+        recipe_text = f"""
+*Recipe:* {recipe_data['title']}
+
+*Ingredients:*
+{''.join(recipe_data['ingredients'])}
+
+*Instructions:*
+{recipe_data['instructions']}
+
+[Source]({recipe_data['sourceUrl']})
+[Recipe Image]({recipe_data['image']})
+        """
+        send_message(chat_id=ctx.chat_id, text=recipe_text)
+    else:
+        send_message(
+            chat_id=ctx.chat_id,
+            text="Sorry, I couldn't find a vegetarian recipe right now. Please try again later.",
+        )
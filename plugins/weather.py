@@ -0,0 +1,78 @@
+"""
+/weather: current weather of a city from OpenWeather.
+"""
+
+import requests
+
+import http_client
+from commands import ROUTER
+from config import CACHE_TTL, OPEN_WEATHER_KEY, check_keys
+from country_index import lookup_country, resolve_location
+from response_cache import cached
+
+check_keys("OPEN_WEATHER_KEY")
+
+
+# To get country code by country name
+def get_country_code(country_name):
+    """
+    Convert a country name to country code (e.g., 'India' -> 'IN', 'USA' -> 'US').
+    Common names, codes, aliases and small typos are accepted, see country_index.py.
+    """
+    return lookup_country(country_name)
+
+
+# The upstream call is cached per (city, country code), so "USA" and
+# "United States" share one entry
+@cached("openweather", *CACHE_TTL["openweather"], cache_if=lambda r: r is not None)
+def fetch_weather(city, country_code):
+    weather_url = f"http://api.openweathermap.org/data/2.5/weather?q={city},{country_code}&appid={OPEN_WEATHER_KEY}&units=metric"
+    try:
+        response = http_client.get(weather_url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching weather: {e}")
+        return None
+    if response.status_code == 200:
+        weather_data = response.json()
+        temp = weather_data["main"]["temp"]
+        description = weather_data["weather"][0]["description"].capitalize()
+        return temp, description
+    return None
+
+
+# Fetch weather details when country code is provided
+def get_weather(city, country):
+    location = resolve_location(city, country)
+    if not location:
+        return "❌ Invalid country name! Please enter a valid country (e.g., 'India')."
+    weather = fetch_weather(*location)
+    if weather:
+        temp, description = weather
+        return f"🌤 Weather in {city.capitalize()}, {country.capitalize()}:\n🌡 Temperature: {temp}°C\n☁ Condition: {description}"
+
+    return "Error: Unable to get weather update!"
+
+
+@ROUTER.command("/weather")
+def weather_command(ctx):
+    """
+    Fetches weather details if the user provides a city and country.
+    Ensures correct input format and prevents errors.
+    """
+    inpu = ctx.args
+
+    if not inpu:
+        ctx.reply(
+            "❌ Please enter the city and country in this format:\n<code>/weather Delhi, India</code>"
+        )
+        return
+
+    try:
+        city, country = map(str.strip, inpu.split(", ", 1))
+    except ValueError:
+        ctx.reply(
+            "❌ Invalid format! Please enter as: <code>/weather City, Country</code>\nExample: <code>/weather Delhi, India</code>"
+        )
+        return
+    weather = get_weather(city, country)
+    ctx.reply(weather)
@@ -0,0 +1,219 @@
+"""
+In-memory cache for the replies built from upstream APIs (weather, GitHub, OMDB, ...).
+
+Entries are keyed on the upstream name plus the normalized arguments, so
+"/weather Delhi, India" and "/weather  delhi, INDIA" share one entry. Every
+upstream has its own TTL. After the TTL an entry is still served for
+`stale_ttl` seconds while a background thread fetches a fresh copy
+(stale-while-revalidate), so repeated lookups never wait for the upstream.
+Misses for the same key that arrive together share one upstream call
+(single_flight.py). The cache is bounded and evicts the least recently used entry.
+Values built from a last good response that http_client replayed while an
+upstream's breaker is open are returned but not stored, they are not fresh.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import http_client
+from metrics import METRICS
+from single_flight import SingleFlight
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+
+def normalize(value):
+    """
+    Makes equal lookups produce equal keys: strings are stripped, lowercased
+    and have their inner whitespace collapsed.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    return value
+
+
+def is_ok_reply(text):
+    """
+    Error replies are not cached, so the next request tries the upstream again.
+    """
+    return bool(text) and not text.startswith(("❌", "Error", "Sorry"))
+
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, stored_at, ttl, stale_ttl)
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._counters = defaultdict(
+            lambda: {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0}
+        )
+
+    def _count(self, upstream, name):
+        self._counters[upstream][name] += 1
+
+    def _store(self, key, value, ttl, stale_ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), ttl, stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._count(old_key[0], "evictions")
+
+    def _load(self, key, loader, ttl, stale_ttl, cache_if):
+        replays = http_client.replay_count()
+        value = loader()
+        fresh = http_client.replay_count() == replays
+        if fresh and (cache_if is None or cache_if(value)):
+            self._store(key, value, ttl, stale_ttl)
+        return value
+
+    def _refresh(self, key, loader, ttl, stale_ttl, cache_if):
+        try:
+            self._load(key, loader, ttl, stale_ttl, cache_if)
+        except Exception as e:
+            print(f"Background refresh failed for {key[0]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_load(self, key, loader, ttl, stale_ttl=0, cache_if=None):
+        """
+        Returns the cached value for `key` or calls `loader()` to produce it.
+        `key[0]` must be the upstream name, it is used for the counters.
+        Values for which `cache_if(value)` is false are returned but not stored.
+        Concurrent misses for the same key wait for a single `loader()` call.
+        """
+        upstream = key[0]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at, entry_ttl, entry_stale_ttl = entry
+                age = now - stored_at
+                if age < entry_ttl:
+                    self._entries.move_to_end(key)
+                    self._count(upstream, "hits")
+                    return value
+                if age < entry_ttl + entry_stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._count(upstream, "stale_hits")
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(key, loader, ttl, stale_ttl, cache_if),
+                            daemon=True,
+                        ).start()
+                    return value
+                del self._entries[key]
+            self._count(upstream, "misses")
+
+        return self._flights.do(
+            key, lambda: self._load(key, loader, ttl, stale_ttl, cache_if)
+        )
+
+    def get(self, key):
+        """
+        Returns the fresh value stored for `key`, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < entry[2]:
+                self._entries.move_to_end(key)
+                self._count(key[0], "hits")
+                return entry[0]
+            self._count(key[0], "misses")
+            return None
+
+    def put(self, key, value, ttl, stale_ttl=0):
+        self._store(key, value, ttl, stale_ttl)
+
+    def invalidate(self, upstream=None):
+        with self._lock:
+            if upstream is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == upstream]:
+                    del self._entries[key]
+
+    def stats(self):
+        """
+        Returns hit/miss counters per upstream, plus the current size.
+        """
+        with self._lock:
+            stats = {upstream: dict(c) for upstream, c in self._counters.items()}
+            stats["size"] = len(self._entries)
+        stats["in_flight"] = self._flights.in_flight()
+        return stats
+
+
+CACHE = ResponseCache()
+
+
+def cache_metrics(cache):
+    """
+    Returns {(upstream, result): count} of a cache, for METRICS.
+    """
+    return {
+        (upstream, result): count
+        for upstream, counters in cache.stats().items()
+        if upstream not in ("size", "in_flight")
+        for result, count in counters.items()
+    }
+
+
+METRICS.counter_callback(
+    "bot_cache_lookups_total",
+    "Reply cache lookups per upstream and result (hits, stale_hits, misses, evictions)",
+    lambda: cache_metrics(CACHE),
+    ("upstream", "result"),
+)
+METRICS.gauge_callback(
+    "bot_cache_entries", "Entries in the reply cache", lambda: CACHE.stats()["size"]
+)
+METRICS.gauge_callback(
+    "bot_cache_loads_in_flight",
+    "Upstream lookups running for a cache miss right now",
+    lambda: CACHE.stats()["in_flight"],
+)
+
+
+def cached(upstream, ttl, stale_ttl=0, key=None, cache_if=None):
+    """
+    Decorator that caches the result of an upstream lookup in CACHE.
+
+    upstream  - name used in the key and the counters (e.g. "openweather")
+    ttl       - seconds an entry is fresh
+    stale_ttl - extra seconds an expired entry is served while it is refreshed
+    key       - optional function building the key from the call arguments
+    cache_if  - optional predicate, results for which it is false are not cached
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                parts = normalize(key(*args, **kwargs))
+            else:
+                parts = normalize(args) + normalize(tuple(sorted(kwargs.items())))
+            if not isinstance(parts, tuple):
+                parts = (parts,)
+            return CACHE.get_or_load(
+                (upstream,) + parts,
+                lambda: func(*args, **kwargs),
+                ttl,
+                stale_ttl,
+                cache_if,
+            )
+
+        wrapper.upstream = upstream
+        return wrapper
+
+    return decorator
@@ -0,0 +1,113 @@
+"""
+Keeps contributors.txt of DevInnovators-FirstOpenSourceCommit in memory, indexed by roll number.
+
+The file is parsed once into a dict, so /devian lookups are a single dict
+access without any network call. A background thread refreshes the index with
+conditional requests (ETag / If-Modified-Since); when the file did not change
+GitHub answers 304 and nothing is downloaded or parsed again.
+"""
+
+import os
+import re
+import threading
+import time
+
+import http_client
+
+ROSTER_URL = "https://raw.githubusercontent.com/adarshkr357/DevInnovators-FirstOpenSourceCommit/main/contributors.txt"
+ROSTER_REFRESH_SECONDS = int(os.getenv("ROSTER_REFRESH_SECONDS", "900"))
+
+ROLL_PATTERN = re.compile(r"Roll:\s*([^,]+)")
+
+
+def normalize_roll(roll_no):
+    return roll_no.strip().casefold()
+
+
+def parse_roster(text):
+    """
+    Builds the roll number -> line index. The first line for a roll number wins,
+    like the old linear scan did.
+    """
+    index = {}
+    for line in text.split("\n"):
+        match = ROLL_PATTERN.search(line)
+        if match:
+            index.setdefault(normalize_roll(match.group(1)), line.strip())
+    return index
+
+
+class Roster:
+    def __init__(self, url=ROSTER_URL, refresh_seconds=ROSTER_REFRESH_SECONDS):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.index = {}
+        self.etag = None
+        self.last_modified = None
+        self.loaded_at = None
+        self._loaded = threading.Event()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set()
+
+    def refresh(self):
+        """
+        Downloads the roster if it changed since the last refresh.
+        Returns True when the index was rebuilt.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = http_client.get(self.url, headers=headers)
+        if response.status_code == 304:
+            self.loaded_at = time.time()
+            return False
+        response.raise_for_status()
+
+        # Swap the whole dict at once, readers never see a half built index
+        self.index = parse_roster(response.text)
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.loaded_at = time.time()
+        self._loaded.set()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing devians roster: {e}")
+            # Retry sooner while nothing has been loaded yet
+            wait = self.refresh_seconds if self.loaded else 30
+            self._stop.wait(wait)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="roster-refresh", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_until_loaded(self, timeout):
+        return self._loaded.wait(timeout)
+
+    def lookup(self, roll_no):
+        return self.index.get(normalize_roll(roll_no))
+
+    def lookup_many(self, roll_nos):
+        """
+        Returns a list of (roll_no, line or None), in the order asked for.
+        """
+        index = self.index
+        return [(roll_no, index.get(normalize_roll(roll_no))) for roll_no in roll_nos]
@@ -0,0 +1,317 @@
+"""
+Outbound queue for every message, photo and document the bot sends.
+
+Telegram allows about 30 messages per second overall, about one per second in
+a private chat and 20 per minute in a group. Going over that returns 429 with a
+`retry_after`, and before this queue those replies were simply lost. Now every
+send waits for a token of the global bucket and of the chat's bucket, a 429 puts
+the message back for `retry_after` seconds, and network errors are retried with
+exponential backoff. Messages to the same chat are always sent in order.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+
+import http_client
+from config import BASE_URL
+from metrics import METRICS
+
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "4"))
+GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", "30"))  # messages per second
+PRIVATE_CHAT_RATE = float(os.getenv("PRIVATE_CHAT_RATE", "1"))  # per second
+GROUP_CHAT_RATE = float(os.getenv("GROUP_CHAT_RATE", str(20 / 60)))  # per second
+CHAT_BURST = int(os.getenv("CHAT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))
+
+
+class TokenBucket:
+    """
+    Classic token bucket, `rate` tokens per second up to `capacity`.
+    Not thread safe on its own, SendQueue only uses it under its lock.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """
+        Seconds until a token is available, 0 if one is available now.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendJob:
+    __slots__ = ("method", "chat_id", "data", "files", "future", "queued_at", "attempts")
+
+    def __init__(self, method, chat_id, data, files):
+        self.method = method
+        self.chat_id = chat_id
+        self.data = data
+        self.files = files
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+
+class SendQueue:
+    def __init__(self, workers=SEND_WORKERS, global_rate=GLOBAL_SEND_RATE):
+        self.workers = workers
+        self.global_bucket = TokenBucket(global_rate, max(1, int(global_rate)))
+        self._chat_buckets = {}
+        self._chats = {}  # chat_id -> deque of jobs waiting for that chat
+        self._ready = []  # heap of (ready_at, seq, chat_id), one entry per idle chat
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self._depth = 0
+        self._stats = {
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "rate_limited": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative
+            rate = GROUP_CHAT_RATE if str(chat_id).startswith("-") else PRIVATE_CHAT_RATE
+            bucket = TokenBucket(rate, CHAT_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"send-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, method, chat_id, data, files=None):
+        """
+        Queues a Bot API call for a chat. Returns a Future with the decoded
+        Telegram response, or the exception if every retry failed.
+        """
+        job = SendJob(method, chat_id, data, files)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Send queue is closed.")
+            if not self._threads:
+                self._start()
+            queue = self._chats.get(chat_id)
+            if queue is None:
+                queue = deque()
+                self._chats[chat_id] = queue
+                heapq.heappush(self._ready, (time.monotonic(), next(self._seq), chat_id))
+            queue.append(job)
+            self._depth += 1
+            self._cond.notify()
+        return job.future
+
+    def take_token(self, chat_id):
+        """
+        For a reply sent outside the queue (in the webhook response): takes a
+        global and a chat token and returns True, or returns False when the chat
+        still has replies queued or a token is not available right now. The
+        reply must then be queued, so it neither overtakes the earlier ones
+        nor goes over the rate limits.
+        """
+        with self._cond:
+            if self._closed or chat_id in self._chats:
+                return False
+            now = time.monotonic()
+            bucket = self._chat_bucket(chat_id)
+            if bucket.wait_time(now) > 0 or self.global_bucket.wait_time(now) > 0:
+                return False
+            bucket.take(now)
+            self.global_bucket.take(now)
+            self._prune_buckets()
+            return True
+
+    def _reschedule(self, chat_id, ready_at):
+        heapq.heappush(self._ready, (ready_at, next(self._seq), chat_id))
+        self._cond.notify()
+
+    def _next_job(self):
+        """
+        Waits until some chat has a job that may be sent now and returns it.
+        The chat stays out of the heap until the job is done, so a chat never
+        has two messages in flight.
+        """
+        with self._cond:
+            while True:
+                if self._closed and not self._depth:
+                    return None
+                if not self._ready:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                ready_at, _, chat_id = self._ready[0]
+                if ready_at > now:
+                    self._cond.wait(ready_at - now)
+                    continue
+                heapq.heappop(self._ready)
+
+                wait = max(
+                    self._chat_bucket(chat_id).wait_time(now),
+                    self.global_bucket.wait_time(now),
+                )
+                if wait > 0:
+                    self._reschedule(chat_id, now + wait)
+                    continue
+
+                self._chat_bucket(chat_id).take(now)
+                self.global_bucket.take(now)
+                return self._chats[chat_id][0]
+
+    def _finish(self, job, ready_at=None):
+        """
+        Called after an attempt. ready_at is set when the job has to be retried.
+        """
+        with self._cond:
+            queue = self._chats[job.chat_id]
+            if ready_at is None:
+                queue.popleft()
+                self._depth -= 1
+                if queue:
+                    self._reschedule(job.chat_id, time.monotonic())
+                else:
+                    del self._chats[job.chat_id]
+                    self._prune_buckets()
+                if self._closed:
+                    self._cond.notify_all()
+            else:
+                self._reschedule(job.chat_id, ready_at)
+
+    def _prune_buckets(self):
+        # Buckets of idle chats that refilled completely carry no state anymore
+        if len(self._chat_buckets) < 1024:
+            return
+        now = time.monotonic()
+        for chat_id in list(self._chat_buckets):
+            if chat_id not in self._chats and self._chat_buckets[chat_id].is_full(now):
+                del self._chat_buckets[chat_id]
+
+    def _record(self, job, ok):
+        latency = time.monotonic() - job.queued_at
+        with self._cond:
+            self._stats["sent" if ok else "failed"] += 1
+            self._stats["latency_total"] += latency
+            self._stats["latency_max"] = max(self._stats["latency_max"], latency)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job.attempts += 1
+            try:
+                for value in (job.files or {}).values():
+                    # Files are read again when a send is retried
+                    stream = value[1] if isinstance(value, tuple) else value
+                    if hasattr(stream, "seek"):
+                        stream.seek(0)
+                response = http_client.post(
+                    BASE_URL + job.method, data=job.data, files=job.files
+                )
+                result = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if job.attempts <= SEND_MAX_RETRIES:
+                    with self._cond:
+                        self._stats["retried"] += 1
+                    self._finish(job, time.monotonic() + min(30, 2**job.attempts))
+                    continue
+                print(f"Giving up on {job.method} to {job.chat_id}: {e}")
+                self._finish(job)
+                self._record(job, False)
+                job.future.set_exception(e)
+                continue
+
+            if response.status_code == 429 and job.attempts <= SEND_MAX_RETRIES:
+                retry_after = result.get("parameters", {}).get("retry_after", 1)
+                with self._cond:
+                    self._stats["rate_limited"] += 1
+                self._finish(job, time.monotonic() + retry_after)
+                continue
+            if response.status_code >= 500 and job.attempts <= SEND_MAX_RETRIES:
+                with self._cond:
+                    self._stats["retried"] += 1
+                self._finish(job, time.monotonic() + min(30, 2**job.attempts))
+                continue
+
+            ok = bool(result.get("ok"))
+            if not ok:
+                print(f"{job.method} to {job.chat_id} failed: {result.get('description')}")
+            self._finish(job)
+            self._record(job, ok)
+            job.future.set_result(result)
+
+    @property
+    def depth(self):
+        return self._depth
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["depth"] = self._depth
+            stats["chats_waiting"] = len(self._chats)
+        done = stats["sent"] + stats["failed"]
+        stats["latency_avg"] = stats.pop("latency_total") / done if done else 0.0
+        return stats
+
+    def close(self, timeout=10):
+        """
+        Stops accepting jobs and waits up to `timeout` seconds for the queue to drain.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+
+SEND_QUEUE = SendQueue()
+
+METRICS.gauge_callback(
+    "bot_send_queue_depth", "Replies waiting to be sent", lambda: SEND_QUEUE.depth
+)
+METRICS.counter_callback(
+    "bot_sends_total",
+    "Replies sent to Telegram, per result (retried and rate_limited count attempts)",
+    lambda: {
+        (result,): value
+        for result, value in SEND_QUEUE.stats().items()
+        if result in ("sent", "failed", "retried", "rate_limited")
+    },
+    ("result",),
+)
@@ -0,0 +1,102 @@
+"""
+Background services that must exist once per bot, not once per process.
+
+LiveScores and NewsDigest poll an upstream API in the background so any number
+of users cost one request per interval. With WORKER_PROCESSES > 1 every worker
+process would start its own poller, so the supervisor (see supervisor.py) owns
+them instead and serves them over a local multiprocessing manager. The plugins
+in the workers get proxies with the same methods. Score changes are pushed
+through the worker of the subscribed chat, so every message to a chat still
+leaves from a single SEND_QUEUE.
+
+Without workers, get() simply creates the service in this process.
+"""
+
+import os
+import threading
+from multiprocessing.managers import BaseManager
+
+# Set by the supervisor for its workers: "host:port" of the manager
+SHARED_SERVICES_ENV = "BOT_SHARED_SERVICES"
+
+
+def _live_scores(send_message):
+    from config import CRIC_KEY
+    from live_scores import LiveScores
+
+    return LiveScores(CRIC_KEY, send_message).start()
+
+
+def _news(send_message):
+    from config import NEWS_API_KEY, NEWS_URL
+    from news_digest import NewsDigest
+
+    return NewsDigest(NEWS_API_KEY, NEWS_URL).start()
+
+
+# Service name -> function creating it, given the send_message it pushes with
+FACTORIES = {"live_scores": _live_scores, "news": _news}
+
+
+class _Manager(BaseManager):
+    pass
+
+
+class _Services:
+    """
+    Creates each service on first use, so a bot nobody asks for /news never
+    polls newsapi.org.
+    """
+
+    def __init__(self, send_message):
+        self.send_message = send_message
+        self._services = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                service = self._services[name] = FACTORIES[name](self.send_message)
+            return service
+
+
+_LOCAL = None
+_local_lock = threading.Lock()
+
+
+def serve(send_message):
+    """
+    Serves the services to other processes from a thread of this one.
+    Returns the address to put in SHARED_SERVICES_ENV.
+    """
+    services = _Services(send_message)
+    for name in FACTORIES:
+        _Manager.register(name, callable=lambda name=name: services.get(name))
+    # The workers are spawned by this process and share its authkey
+    server = _Manager(address=("127.0.0.1", 0)).get_server()
+    threading.Thread(target=server.serve_forever, name="shared-services", daemon=True).start()
+    host, port = server.address
+    return f"{host}:{port}"
+
+
+def get(name):
+    """
+    The service `name`: a proxy to the supervisor's one in a worker process,
+    otherwise the one of this process, created on first use.
+    """
+    global _LOCAL
+    address = os.getenv(SHARED_SERVICES_ENV)
+    if address:
+        host, port = address.rsplit(":", 1)
+        _Manager.register(name)
+        manager = _Manager(address=(host, int(port)))
+        manager.connect()
+        return getattr(manager, name)()
+
+    with _local_lock:
+        if _LOCAL is None:
+            from telegram_api import send_message
+
+            _LOCAL = _Services(send_message)
+    return _LOCAL.get(name)
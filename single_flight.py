@@ -0,0 +1,67 @@
+"""
+Coalesces identical upstream lookups that are in flight at the same time.
+
+When twenty chats ask for "/weather Delhi, India" within the same second, the
+first call goes to the upstream and the other nineteen wait for it and get
+the same reply (or the same exception) instead of sending their own request.
+Keys are tuples whose first item names the upstream, like the keys of
+response_cache.CACHE; it is used for the counters.
+"""
+
+import threading
+
+from metrics import METRICS
+
+COALESCED = METRICS.counter(
+    "bot_coalesced_calls_total",
+    "Lookups that waited for an identical call already in flight, per upstream",
+    ("upstream",),
+)
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Returns func(), sharing one call between all threads asking for `key`
+        at the same time. An exception raised by func() is raised in every one.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(key[0])
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,326 @@
+"""
+Runs the bot's handlers in several worker processes (WORKER_PROCESSES > 1).
+
+One process can only use one core, so with many chats sending files to convert
+the bot is limited by the GIL. In this mode the process started by
+long-polling.py becomes a supervisor: it still runs getUpdates and the
+UpdateEngine (offsets, per-chat order), but handling an update means sending
+it to one of N worker processes and waiting for the worker to report it done.
+Chats are sharded by chat id, so a chat always goes to the same worker and
+keeps its history and cache there, and its replies leave from one SEND_QUEUE in
+order. The live score and news pollers run once, in this process (see
+shared_services.py), and score changes are pushed through the chat's worker.
+
+The supervisor pings every worker and replaces one that died or stopped
+answering. Updates that were running in it are logged and skipped, like an
+update whose handler raised. SIGTERM / Ctrl+C stop fetching, let the running
+updates finish, then stop the workers.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import shared_services
+from config import MAX_CONCURRENCY
+from update_engine import UpdateEngine, chat_key
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))
+# Seconds between health checks, and how long a worker may take to answer one
+WORKER_PING_SECONDS = float(os.getenv("WORKER_PING_SECONDS", "5"))
+WORKER_PING_TIMEOUT = float(os.getenv("WORKER_PING_TIMEOUT", "30"))
+# How long shutdown waits for a worker to finish before killing it
+WORKER_STOP_SECONDS = 10
+
+
+class WorkerCrashed(Exception):
+    """The worker handling the update died or was restarted."""
+
+
+def _worker_settings(workers):
+    """
+    Per-worker share of settings meant for the whole bot, so N workers do not
+    send N times GLOBAL_SEND_RATE or start N times CONVERT_WORKERS processes.
+    """
+    convert = int(os.getenv("CONVERT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+    send_rate = float(os.getenv("GLOBAL_SEND_RATE", "30"))
+    return {
+        "CONVERT_WORKERS": str(max(1, convert // workers)),
+        "GLOBAL_SEND_RATE": str(send_rate / workers),
+    }
+
+
+def _worker_main(index, conn):
+    # Imported here: the supervisor itself never runs a handler
+    import handlers  # Registers the bot's commands on ROUTER
+    import plugins
+    from chat_history import HISTORY
+    from commands import ROUTER
+    from conversion_pool import POOL
+    from send_queue import SEND_QUEUE
+    from telegram_api import send_message
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The supervisor decides when to stop
+    plugins.prewarm()
+    send_lock = threading.Lock()
+
+    def reply(*message):
+        with send_lock:
+            conn.send(message)
+
+    def handle(update):
+        error = None
+        try:
+            ROUTER.dispatch(update)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        reply("done", update["update_id"], error)
+
+    executor = ThreadPoolExecutor(
+        max_workers=MAX_CONCURRENCY, thread_name_prefix=f"worker{index}"
+    )
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            kind, value = message
+            if kind == "update":
+                executor.submit(handle, value)
+            elif kind == "ping":
+                reply("pong", value)
+            elif kind == "push":
+                # A score change from the shared poller for a chat of this worker
+                send_message(*value)
+    finally:
+        executor.shutdown(wait=True)
+        POOL.shutdown()
+        HISTORY.close()
+        SEND_QUEUE.close()
+
+
+class _Worker:
+    def __init__(self, ctx, index, on_exit):
+        self.index = index
+        self.on_exit = on_exit
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(index, child_conn), name=f"bot-worker-{index}"
+        )
+        self.process.start()
+        child_conn.close()
+        self.started_at = time.monotonic()
+        self.last_pong = self.started_at
+        self._waiting = {}  # update_id -> Future
+        self._lock = threading.Lock()
+        self._dead = False
+        threading.Thread(target=self._read, name=f"worker{index}-reader", daemon=True).start()
+
+    def _read(self):
+        while True:
+            try:
+                kind, *values = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "pong":
+                self.last_pong = time.monotonic()
+            elif kind == "done":
+                update_id, error = values
+                with self._lock:
+                    future = self._waiting.pop(update_id, None)
+                if future is not None:
+                    future.set_result(error)
+        self._fail_waiting()
+        self.on_exit()
+
+    def _fail_waiting(self):
+        with self._lock:
+            self._dead = True
+            waiting, self._waiting = self._waiting, {}
+        for future in waiting.values():
+            future.set_exception(WorkerCrashed(f"worker {self.index} stopped"))
+
+    def send(self, message):
+        with self._lock:
+            self.conn.send(message)
+
+    def handle(self, update):
+        """
+        Sends the update and returns a Future with the handler's error text (or None).
+        Raises WorkerCrashed when the update could not be sent.
+        """
+        future = Future()
+        with self._lock:
+            if self._dead:
+                raise WorkerCrashed(f"worker {self.index} stopped")
+            try:
+                self.conn.send(("update", update))
+            except OSError as e:
+                raise WorkerCrashed(str(e)) from e
+            self._waiting[update["update_id"]] = future
+        return future
+
+    @property
+    def dead(self):
+        return self._dead
+
+    @property
+    def running(self):
+        return len(self._waiting)
+
+    def healthy(self, timeout):
+        return self.process.is_alive() and time.monotonic() - self.last_pong < timeout
+
+    def stop(self, wait):
+        try:
+            self.send(None)
+        except OSError:
+            pass
+        self.process.join(wait)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+        self._fail_waiting()
+
+
+class Supervisor:
+    def __init__(self, fetch_updates, workers=WORKER_PROCESSES, offset=None, on_commit=None):
+        self.workers = max(1, workers)
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._settings = _worker_settings(self.workers)
+        self._slots = []
+        self._slots_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self.engine = UpdateEngine(
+            fetch_updates,
+            self.handle_update,
+            concurrency=MAX_CONCURRENCY * self.workers,
+            offset=offset,
+            on_commit=on_commit,
+        )
+
+    def _spawn(self, index):
+        # The child reads these at import time, it inherits the environment
+        saved = {name: os.environ.get(name) for name in self._settings}
+        os.environ.update(self._settings)
+        try:
+            return _Worker(self._ctx, index, self._wake.set)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    def start(self):
+        self._settings[shared_services.SHARED_SERVICES_ENV] = shared_services.serve(self.push)
+        self._slots = [self._spawn(index) for index in range(self.workers)]
+        threading.Thread(target=self._monitor, name="worker-monitor", daemon=True).start()
+        print(f"Started {self.workers} worker processes")
+
+    def handle_update(self, update):
+        """
+        Runs on an engine thread: hands the update to its chat's worker and
+        waits until it was handled, so the engine keeps the chat's order.
+        """
+        index = hash(chat_key(update)) % self.workers
+        while True:
+            with self._slots_lock:
+                worker = self._slots[index]
+            try:
+                future = worker.handle(update)
+                break
+            except WorkerCrashed:
+                # Not sent: wait for the monitor to replace the worker
+                if self._stopping.is_set():
+                    raise
+                time.sleep(0.1)
+        error = future.result()
+        if error:
+            raise RuntimeError(error)
+
+    def push(self, chat_id, text):
+        """
+        send_message of the shared services: sends through the chat's worker,
+        behind the replies it already queued for that chat.
+        """
+        with self._slots_lock:
+            worker = self._slots[hash(chat_id) % self.workers]
+        try:
+            worker.send(("push", (chat_id, text)))
+        except OSError as e:
+            print(f"Could not push a message to {chat_id}: {e}")
+
+    def _restart(self, index, reason):
+        with self._slots_lock:
+            old = self._slots[index]
+        print(f"Restarting worker {index}: {reason} ({old.running} updates lost)")
+        old.stop(wait=0)
+        new = self._spawn(index)
+        with self._slots_lock:
+            self._slots[index] = new
+        self.restarts += 1
+
+    def _monitor(self):
+        ping = 0
+        while not self._stopping.is_set():
+            # Woken early when a worker exits
+            self._wake.wait(WORKER_PING_SECONDS)
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            ping += 1
+            for index in range(self.workers):
+                with self._slots_lock:
+                    worker = self._slots[index]
+                if worker.dead or not worker.process.is_alive():
+                    worker.process.join(1)
+                    self._restart(index, f"exited with code {worker.process.exitcode}")
+                elif not worker.healthy(WORKER_PING_TIMEOUT):
+                    self._restart(index, f"no answer for {WORKER_PING_TIMEOUT:.0f} seconds")
+                else:
+                    try:
+                        worker.send(("ping", ping))
+                    except OSError:
+                        pass  # Restarted on the next round
+
+    def stop(self):
+        """
+        Stops fetching; run() then waits for the running updates and returns.
+        """
+        self._stopping.set()
+        self._wake.set()
+        self.engine.stop()
+
+    async def _run(self):
+        task = asyncio.get_running_loop().create_task(self.engine.run())
+        while not self._stopping.is_set() and not task.done():
+            await asyncio.sleep(0.2)
+        # The last getUpdates may still be waiting, its updates are dropped
+        # unconfirmed and fetched again on the next start
+        await self.engine.drain()
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+        self.start()
+        try:
+            asyncio.run(self._run())
+        finally:
+            self._stopping.set()
+            for worker in self._slots:
+                worker.stop(wait=WORKER_STOP_SECONDS)
+            # The last long poll is left to its daemon thread, see UpdateEngine
+            self.engine.shutdown()
+            print(f"Workers stopped ({self.restarts} restarts)")
@@ -0,0 +1,146 @@
+"""
+Calls to the Telegram Bot API.
+
+send_message, send_photo and send_document go through the rate limited
+SEND_QUEUE (see send_queue.py) and return a Future with Telegram's response.
+"""
+
+import json
+import tempfile
+
+import http_client
+from config import BASE_URL, FILE_URL, MAX_DOWNLOAD_BYTES
+from send_queue import SEND_QUEUE
+
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def get_updates(offset=None, timeout=100, limit=None, allowed_updates=None):
+    url = BASE_URL + "getUpdates"
+    params = {"timeout": timeout, "offset": offset}
+    if limit:
+        params["limit"] = limit
+    if allowed_updates is not None:
+        params["allowed_updates"] = json.dumps(allowed_updates)
+    # Read timeout has to be longer than the long-poll timeout
+    response = http_client.get(url, params=params, timeout=(5, timeout + 10)).json()
+    return response
+
+
+def message_data(
+    chat_id,
+    text,
+    reply_to_message_id=None,
+    disable_web_page_preview=True,
+    parse_mode="HTML",
+):
+    """
+    Builds the sendMessage parameters, also used for replies that are
+    returned in the webhook response instead of being sent.
+    """
+    data = {
+        "chat_id": chat_id,
+        "text": text,
+        "disable_web_page_preview": disable_web_page_preview,  # Disables the preview by default
+    }
+
+    if parse_mode:
+        data["parse_mode"] = parse_mode  # None sends the text as it is
+
+    if reply_to_message_id:
+        data["reply_to_message_id"] = reply_to_message_id  # Reply to user's message
+
+    return data
+
+
+def send_message(
+    chat_id,
+    text,
+    reply_to_message_id=None,
+    disable_web_page_preview=True,
+    parse_mode="HTML",
+):
+    data = message_data(
+        chat_id, text, reply_to_message_id, disable_web_page_preview, parse_mode
+    )
+    return SEND_QUEUE.submit("sendMessage", chat_id, data)
+
+
+def send_photo(
+    chat_id,
+    photo,
+    reply_to_message_id=None,
+    caption=None,
+    disable_web_page_preview=True,
+):
+    """
+    Added this in order to convert URL into an image
+    """
+    data = {
+        "chat_id": chat_id,
+        "photo": photo,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": disable_web_page_preview,  # Disables the preview by default
+    }
+
+    if reply_to_message_id:
+        data["reply_to_message_id"] = reply_to_message_id  # Reply to user's message
+
+    if caption:
+        data["caption"] = caption
+
+    return SEND_QUEUE.submit("sendPhoto", chat_id, data)
+
+
+def send_document(chat_id, document, filename, reply_to_message_id, caption=None):
+    """
+    `document` is a file object to upload, or the file_id (str) of a document
+    Telegram already has, which is sent again without uploading anything.
+    """
+    data = {"chat_id": chat_id, "parse_mode": "HTML"}
+    files = None
+    if isinstance(document, str):
+        data["document"] = document
+    else:
+        files = {"document": (filename, document)}
+
+    if caption:
+        data["caption"] = caption
+
+    if reply_to_message_id:
+        data["reply_to_message_id"] = reply_to_message_id  # Reply to user's message
+
+    return SEND_QUEUE.submit("sendDocument", chat_id, data, files)
+
+
+def get_file(file_id):
+    url = BASE_URL + "getFile"
+    return http_client.get(url, params={"file_id": file_id}).json()
+
+
+class FileTooLarge(Exception):
+    """The file is bigger than the allowed download size."""
+
+
+def download_file(file_path, max_bytes=MAX_DOWNLOAD_BYTES):
+    """
+    Streams a file from Telegram into a spooled buffer (in memory while small,
+    on disk after that) and returns it rewound. Raises FileTooLarge as soon as
+    the file turns out to be bigger than `max_bytes`, without reading the rest.
+    """
+    with http_client.get(FILE_URL + file_path, stream=True) as response:
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        if length and int(length) > max_bytes:
+            raise FileTooLarge()
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > max_bytes:
+                buffer.close()
+                raise FileTooLarge()
+            buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
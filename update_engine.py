@@ -0,0 +1,197 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def chat_key(update):
+    """
+    Returns the chat id an update belongs to, used to keep per-chat ordering.
+    Updates without a chat (e.g. inline queries) are keyed by their update_id
+    so they never wait behind each other.
+    """
+    for field in ("message", "edited_message", "channel_post", "callback_query"):
+        payload = update.get(field)
+        if payload:
+            if field == "callback_query":
+                payload = payload.get("message") or {}
+            chat_id = payload.get("chat", {}).get("id")
+            if chat_id is not None:
+                return chat_id
+    return ("update", update.get("update_id"))
+
+
+def _resolve(future, result, error):
+    if not future.done():  # Cancelled when the engine stopped meanwhile
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def _run_in_daemon_thread(loop, func, *args):
+    """
+    Like loop.run_in_executor(), but on a daemon thread: a long poll that is
+    still waiting must not keep the process alive after shutdown.
+    """
+    future = loop.create_future()
+
+    def run():
+        result = error = None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        try:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+        except RuntimeError:
+            pass  # The loop is closed, nobody waits for the result
+
+    threading.Thread(target=run, name="update-fetch", daemon=True).start()
+    return future
+
+
+class UpdateEngine:
+    """
+    Pulls updates from getUpdates and runs the handler for them concurrently.
+
+    At most `concurrency` handlers run at the same time. Every chat gets its own
+    queue that is drained by a single task, so messages from the same chat are
+    still answered in the order they were sent while other chats keep moving.
+    Handlers are the regular blocking functions of the bot, so they run on a
+    thread pool and never block the event loop. fetch_updates runs on its own
+    daemon thread, so it never waits for a handler slot and a pending long
+    poll does not delay shutdown().
+
+    `fetch_updates(offset, limit)` must return a list of updates, `limit` is
+    how many more updates fit in the backlog. `on_commit(offset)` is called
+    whenever every update below `offset` has been handled. Note that the next
+    getUpdates already confirms the fetched updates to Telegram while they
+    run, so persisting this offset does not protect them from a crash (see
+    offset_store.py).
+    """
+
+    def __init__(
+        self,
+        fetch_updates,
+        handle_update,
+        concurrency=8,
+        max_pending=None,
+        offset=None,
+        on_commit=None,
+    ):
+        self.fetch_updates = fetch_updates
+        self.handle_update = handle_update
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending or self.concurrency * 4
+        self.offset = offset
+        self.on_commit = on_commit
+        self._committed = offset
+        self._in_flight = set()
+        self._chats = {}
+        self._pending = 0
+        self._running = False
+        self._semaphore = None
+        self._has_room = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="update-worker"
+        )
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, update):
+        """
+        Queues an update behind earlier updates of the same chat.
+        Must be called from the event loop thread.
+        """
+        key = chat_key(update)
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = deque()
+            self._chats[key] = queue
+            asyncio.get_running_loop().create_task(self._drain(key, queue))
+        queue.append(update)
+        self._in_flight.add(update["update_id"])
+        self._pending += 1
+        if self._pending >= self.max_pending:
+            self._has_room.clear()
+
+    async def _drain(self, key, queue):
+        loop = asyncio.get_running_loop()
+        try:
+            while queue:
+                update = queue.popleft()
+                try:
+                    async with self._semaphore:
+                        await loop.run_in_executor(
+                            self._executor, self.handle_update, update
+                        )
+                except Exception as e:
+                    print(f"Error handling update {update.get('update_id')}: {e}")
+                finally:
+                    self._in_flight.discard(update["update_id"])
+                    self._pending -= 1
+                    if self._pending < self.max_pending:
+                        self._has_room.set()
+                    self._commit()
+        finally:
+            # Nothing can be appended between the last check and this point,
+            # both run on the event loop thread without awaiting in between.
+            del self._chats[key]
+
+    def _commit(self):
+        """
+        Reports the offset below which every update has been handled.
+        """
+        if self.on_commit is None or self.offset is None:
+            return
+        committed = min(self._in_flight) if self._in_flight else self.offset
+        if committed != self._committed:
+            self._committed = committed
+            try:
+                self.on_commit(committed)
+            except Exception as e:
+                print(f"Error saving update offset: {e}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._running = True
+        try:
+            while self._running:
+                # Stop pulling new updates while the backlog is full
+                await self._has_room.wait()
+                room = self.max_pending - self._pending
+                try:
+                    updates = await _run_in_daemon_thread(
+                        loop, self.fetch_updates, self.offset, room
+                    )
+                except Exception as e:
+                    print(f"Error fetching updates: {e}")
+                    await asyncio.sleep(1)
+                    continue
+
+                for update in updates:
+                    self.offset = update["update_id"] + 1
+                    self.submit(update)
+                if not self._in_flight:
+                    self._commit()
+        finally:
+            self._running = False
+
+    def stop(self):
+        self._running = False
+
+    async def drain(self):
+        """
+        Waits until every queued update has been handled.
+        """
+        while self._chats:
+            await asyncio.sleep(0.05)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
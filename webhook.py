@@ -1,58 +1,136 @@
+import hmac
 import os
-import random
-import requests
-from flask import Flask, request
-from dotenv import load_dotenv
-
-load_dotenv()
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-NGROK_URL = ""  # Paste your own ngrok link e.g., https://abcd.ngrok-free.app
-BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/"
+import time
+
+from flask import Flask, jsonify, request
+
+import http_client
+import handlers  # Registers the bot's commands on ROUTER
+import plugins
+from chat_history import HISTORY
+from commands import ROUTER
+from config import ALLOWED_UPDATES, BASE_URL, MAX_CONCURRENCY
+from conversion_pool import POOL
+from metrics import METRICS
+from send_queue import SEND_QUEUE
+from webhook_workers import WebhookWorkers
+
+# Paste your own ngrok link e.g., https://abcd.ngrok-free.app, or set WEBHOOK_BASE_URL
+NGROK_URL = os.getenv("WEBHOOK_BASE_URL", "")
 WEBHOOK_URL = f"{NGROK_URL}/webhook"
+# Telegram sends it back in X-Telegram-Bot-Api-Secret-Token, requests without it are refused
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "5000"))
+WEBHOOK_THREADS = int(os.getenv("WEBHOOK_THREADS", "8"))
+# When set, /metrics needs "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
-greetings = [
-    "Hello!",
-    "Hi there!",
-    "Greetings!",
-    "Salutations!",
-    "Howdy!"
-]
+if not WEBHOOK_SECRET:
+    print("Warning: WEBHOOK_SECRET not set, anyone who knows the URL can send updates")
 
 app = Flask(__name__)
+workers = WebhookWorkers(ROUTER.dispatch, concurrency=MAX_CONCURRENCY)
+
+WEBHOOK_REQUESTS = METRICS.counter(
+    "bot_webhook_requests_total", "Webhook requests per outcome", ("outcome",)
+)
+WEBHOOK_SECONDS = METRICS.histogram(
+    "bot_webhook_seconds", "Time until the webhook request was answered"
+)
+METRICS.gauge_callback(
+    "bot_updates_pending", "Updates received but not handled yet", lambda: workers.depth
+)
 
 def set_webhook():
     url = BASE_URL + "setWebhook"
-    data = {"url": WEBHOOK_URL}
-    response = requests.post(url, data=data)
+    data = {
+        "url": WEBHOOK_URL,
+        "allowed_updates": ALLOWED_UPDATES,
+        "max_connections": WEBHOOK_THREADS,
+    }
+    if WEBHOOK_SECRET:
+        data["secret_token"] = WEBHOOK_SECRET
+    response = http_client.post(url, json=data)
     print("Webhook set:", response.json())
 
-def send_message(chat_id, text):
-    url = BASE_URL + "sendMessage"
-    data = {"chat_id": chat_id, "text": text}
-    requests.post(url, data=data)
+def is_from_telegram():
+    if not WEBHOOK_SECRET:
+        return True
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    return hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode())
+
+def handle_webhook():
+    """
+    Returns (outcome, response), the outcome is counted in the metrics.
+    """
+    if not is_from_telegram():
+        return "forbidden", ("Forbidden", 403)
+
+    update = request.get_json(silent=True)
+    if not update or "update_id" not in update:
+        return "invalid", ("OK", 200)
+    if workers.is_duplicate(update):
+        return "duplicate", ("OK", 200)
+
+    # Commands are shared with long-polling.py, add new ones in handlers.py or plugins/.
+    # Short text commands answer in this response, saving a sendMessage call.
+    if ROUTER.is_inline(update):
+        try:
+            handled, webhook_call = workers.run_inline(update, ROUTER.dispatch_inline)
+        except Exception as e:
+            print(f"Error handling update {update['update_id']}: {e}")
+            return "error", ("OK", 200)
+        if handled:
+            if webhook_call is not None:
+                return "inline_reply", jsonify(webhook_call)
+            return "inline", ("OK", 200)
+
+    # Everything else runs on the workers, Telegram only waits for the queue
+    if not workers.submit(update):
+        # Telegram retries the update later
+        return "busy", ("Busy", 503)
+    return "queued", ("OK", 200)
 
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    update = request.get_json()
-    if update and "message" in update:
-        message = update["message"]
-        chat_id = message.get("chat", {}).get("id", None)
+    started = time.perf_counter()
+    outcome, response = handle_webhook()
+    WEBHOOK_SECONDS.observe(time.perf_counter() - started)
+    WEBHOOK_REQUESTS.inc(outcome)
+    return response
 
-        # Add your command in this block by using elif
-        if message.get("text", "").strip() == "/start":
-            greeting = random.choice(greetings)
-            send_message(chat_id, greeting)
-        else:
-            send_message(chat_id, "Invalid message")
-
-    return "OK", 200
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN:
+        token = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(token.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            return "Forbidden", 403
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
 
 @app.route("/", methods=["GET"])
 def test():
     return "Flask server is up and running!", 200
 
+def serve():
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("waitress is not installed, using Flask's development server")
+        app.run(host=WEBHOOK_HOST, port=WEBHOOK_PORT, threaded=True)
+        return
+    waitress_serve(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, threads=WEBHOOK_THREADS)
+
 if __name__ == "__main__":
+    plugins.prewarm()
+    workers.start()
     print("Setting webhook...")
     set_webhook()
-    print("Starting Flask server on port 5000...")
-    app.run(port=5000)
+    print(f"Starting webhook server on port {WEBHOOK_PORT}...")
+    try:
+        serve()
+    finally:
+        workers.stop()
+        POOL.shutdown()
+        HISTORY.close()
+        SEND_QUEUE.close()
@@ -0,0 +1,164 @@
+"""
+Background handling of webhook updates.
+
+The webhook route only checks and queues an update, then answers 200 at once;
+Telegram redelivers (and slows down) when the answer takes too long. The queued
+updates are run by the same UpdateEngine as long-polling.py, so handlers run
+concurrently, messages of one chat stay in order and the commands are the same.
+
+run_inline() handles an update inside the request instead (see
+CommandRouter.dispatch_inline), but only while no earlier update of the same
+chat is still waiting, and later updates of that chat wait for it to finish.
+Its reply only goes into the webhook response when SEND_QUEUE has nothing
+queued for the chat and a rate limit token is free (see SendQueue.take_token).
+"""
+
+import asyncio
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from update_engine import UpdateEngine, chat_key
+
+WEBHOOK_MAX_QUEUE = int(os.getenv("WEBHOOK_MAX_QUEUE", "1000"))
+# How many recent update_ids are remembered to drop redeliveries
+WEBHOOK_DEDUPE_SIZE = int(os.getenv("WEBHOOK_DEDUPE_SIZE", "10000"))
+
+
+class WebhookWorkers:
+    def __init__(
+        self,
+        handle_update,
+        concurrency=8,
+        max_queue=WEBHOOK_MAX_QUEUE,
+        dedupe_size=WEBHOOK_DEDUPE_SIZE,
+    ):
+        self.handle_update = handle_update
+        self.concurrency = concurrency
+        self.dedupe_size = dedupe_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._seen = OrderedDict()
+        self._seen_lock = threading.Lock()
+        # chat -> updates queued or running, and the chats running inline
+        self._chats = {}
+        self._inline = set()
+        self._chats_cond = threading.Condition()
+        self._engine = None
+        self._thread = None
+        self.duplicates = 0
+        self.rejected = 0
+        self.inline = 0
+
+    def is_duplicate(self, update):
+        """
+        True when the update_id was seen recently, it is remembered otherwise.
+        """
+        update_id = update.get("update_id")
+        if update_id is None:
+            return False
+        with self._seen_lock:
+            if update_id in self._seen:
+                self.duplicates += 1
+                return True
+            self._seen[update_id] = None
+            if len(self._seen) > self.dedupe_size:
+                self._seen.popitem(last=False)
+            return False
+
+    def _enter(self, key):
+        with self._chats_cond:
+            self._chats[key] = self._chats.get(key, 0) + 1
+
+    def _leave(self, key):
+        with self._chats_cond:
+            count = self._chats[key] - 1
+            if count:
+                self._chats[key] = count
+            else:
+                del self._chats[key]
+            self._chats_cond.notify_all()
+
+    def submit(self, update):
+        """
+        Queues an update for the workers. Returns False when the queue is full.
+        """
+        key = chat_key(update)
+        self._enter(key)
+        try:
+            self._queue.put_nowait(update)
+        except queue.Full:
+            self._leave(key)
+            self.rejected += 1
+            # Forget it, so Telegram's redelivery is accepted later
+            with self._seen_lock:
+                self._seen.pop(update.get("update_id"), None)
+            return False
+        return True
+
+    def run_inline(self, update, handler):
+        """
+        Runs handler(update) in the calling thread and returns (True, result),
+        or (False, None) when the chat has updates waiting and it must be
+        submitted instead to keep the order.
+        """
+        key = chat_key(update)
+        with self._chats_cond:
+            if key in self._chats:
+                return False, None
+            self._chats[key] = 1
+            self._inline.add(key)
+        self.inline += 1
+        try:
+            return True, handler(update)
+        finally:
+            with self._chats_cond:
+                self._inline.discard(key)
+            self._leave(key)
+
+    def _handle(self, update):
+        key = chat_key(update)
+        try:
+            with self._chats_cond:
+                # An update of this chat that came earlier is running inline
+                while key in self._inline:
+                    self._chats_cond.wait()
+            self.handle_update(update)
+        finally:
+            self._leave(key)
+
+    def _fetch(self, offset, room):
+        """
+        Feeds the engine from the queue instead of getUpdates.
+        """
+        try:
+            updates = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        while len(updates) < room:
+            try:
+                updates.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return updates
+
+    def start(self):
+        if self._thread is None:
+            self._engine = UpdateEngine(
+                self._fetch, self._handle, concurrency=self.concurrency
+            )
+            self._thread = threading.Thread(
+                target=lambda: asyncio.run(self._engine.run()),
+                name="webhook-workers",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    @property
+    def depth(self):
+        return self._queue.qsize() + (self._engine.pending if self._engine else 0)
+
+    def stop(self):
+        if self._engine is not None:
+            self._engine.stop()